@@ -3,7 +3,7 @@
 
 {
     "name": "Audit Log",
-    "version": "18.0.1.0.1",
+    "version": "18.0.1.0.2",
     "author": "ABF OSIELL, Odoo Community Association (OCA)",
     "license": "AGPL-3",
     "website": "https://github.com/OCA/server-tools",
@@ -17,6 +17,7 @@
         "views/http_session_view.xml",
         "views/http_request_view.xml",
     ],
+    "uninstall_hook": "uninstall_hook",
     "application": True,
     "installable": True,
 }
@@ -0,0 +1,17 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo.tools import SQL
+
+from .models.auditlog_log_line_view import ARCHIVE_LINE_TABLE, ARCHIVE_LOG_TABLE
+
+
+def uninstall_hook(env):
+    """Drop the archive tables (and their partitions), which are not managed
+    by the ORM."""
+    env.cr.execute(
+        SQL(
+            "DROP TABLE IF EXISTS %s, %s CASCADE",
+            SQL.identifier(ARCHIVE_LINE_TABLE),
+            SQL.identifier(ARCHIVE_LOG_TABLE),
+        )
+    )
@@ -0,0 +1,14 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+
+def migrate(cr, version):
+    # The "View logs" shortcuts of the subscribed rules also list the archived
+    # logs now
+    cr.execute(
+        """
+        UPDATE ir_act_window
+        SET res_model = 'auditlog.log.view'
+        WHERE res_model = 'auditlog.log'
+            AND id IN (SELECT action_id FROM auditlog_rule)
+        """
+    )
@@ -5,4 +5,5 @@ from . import http_session
 from . import http_request
 from . import log
 from . import auditlog_log_line_view
+from . import auditlog_log_view
 from . import autovacuum
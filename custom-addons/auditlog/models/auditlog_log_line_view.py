@@ -1,4 +1,51 @@
-from odoo import fields, models
+import psycopg2
+
+from odoo import fields, models, tools
+from odoo.tools import SQL
+from odoo.tools.sql import create_index
+
+# Monthly partitioned tables receiving the logs and lines moved out of the
+# hot tables by `auditlog.autovacuum.archive_logs`
+ARCHIVE_LOG_TABLE = "auditlog_log_archive"
+ARCHIVE_LINE_TABLE = "auditlog_log_line_archive"
+ARCHIVE_LOG_COLUMNS = (
+    "id",
+    "create_uid",
+    "create_date",
+    "write_uid",
+    "write_date",
+    "name",
+    "model_id",
+    "model_name",
+    "model_model",
+    "res_id",
+    "user_id",
+    "method",
+    "http_session_id",
+    "http_request_id",
+    "log_type",
+)
+ARCHIVE_LINE_COLUMNS = (
+    "id",
+    "create_uid",
+    "create_date",
+    "write_uid",
+    "write_date",
+    "field_id",
+    "log_id",
+    "old_value",
+    "new_value",
+    "old_value_text",
+    "new_value_text",
+    "field_name",
+    "field_description",
+)
+ARCHIVE_COMPRESSED_COLUMNS = (
+    "old_value",
+    "new_value",
+    "old_value_text",
+    "new_value_text",
+)
 
 
 class AuditlogLogLineView(models.Model):
@@ -25,6 +72,97 @@ class AuditlogLogLineView(models.Model):
         selection=lambda r: r.env["auditlog.rule"]._fields["log_type"].selection,
         string="Type",
     )
+    # Also set for the archived lines, unlike `log_id`
+    log_view_id = fields.Many2one("auditlog.log.view", string="Log Entry")
+
+    def init(self):
+        super().init()
+        # The archive tables are always read by this view, create them empty
+        self.env.cr.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {ARCHIVE_LOG_TABLE} (
+                id integer NOT NULL,
+                create_uid integer,
+                create_date timestamp NOT NULL,
+                write_uid integer,
+                write_date timestamp,
+                name varchar,
+                model_id integer,
+                model_name varchar,
+                model_model varchar,
+                res_id integer,
+                user_id integer,
+                method varchar,
+                http_session_id integer,
+                http_request_id integer,
+                log_type varchar
+            ) PARTITION BY RANGE (create_date)
+            """
+        )
+        self.env.cr.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {ARCHIVE_LINE_TABLE} (
+                id integer NOT NULL,
+                create_uid integer,
+                create_date timestamp NOT NULL,
+                write_uid integer,
+                write_date timestamp,
+                field_id integer,
+                log_id integer,
+                old_value text,
+                new_value text,
+                old_value_text text,
+                new_value_text text,
+                field_name varchar,
+                field_description varchar
+            ) PARTITION BY RANGE (create_date)
+            """
+        )
+        cr = self.env.cr
+        create_index(cr, f"{ARCHIVE_LOG_TABLE}_id_index", ARCHIVE_LOG_TABLE, ["id"])
+        create_index(
+            cr,
+            f"{ARCHIVE_LOG_TABLE}_model_id_res_id_index",
+            ARCHIVE_LOG_TABLE,
+            ["model_id", "res_id"],
+        )
+        create_index(
+            cr, f"{ARCHIVE_LINE_TABLE}_log_id_index", ARCHIVE_LINE_TABLE, ["log_id"]
+        )
+
+    def _create_archive_partition(self, month, next_month):
+        """Create the partitions of the archive tables holding the rows
+        created from ``month`` (included) to ``next_month`` (excluded).
+        """
+        suffix = month.strftime("%Y_%m")
+        for table in (ARCHIVE_LOG_TABLE, ARCHIVE_LINE_TABLE):
+            partition = f"{table}_{suffix}"
+            self.env.cr.execute(
+                SQL(
+                    "CREATE TABLE IF NOT EXISTS %s PARTITION OF %s "
+                    "FOR VALUES FROM (%s) TO (%s)",
+                    SQL.identifier(partition),
+                    SQL.identifier(table),
+                    fields.Datetime.to_string(month),
+                    fields.Datetime.to_string(next_month),
+                )
+            )
+            if table != ARCHIVE_LINE_TABLE:
+                continue
+            # Compress the values, if the server supports it (PostgreSQL 14+
+            # built with lz4)
+            for column in ARCHIVE_COMPRESSED_COLUMNS:
+                try:
+                    with tools.mute_logger("odoo.sql_db"), self.env.cr.savepoint():
+                        self.env.cr.execute(
+                            SQL(
+                                "ALTER TABLE %s ALTER COLUMN %s SET COMPRESSION lz4",
+                                SQL.identifier(partition),
+                                SQL.identifier(column),
+                            )
+                        )
+                except psycopg2.Error:
+                    break
 
     def _select_query(self):
         return """
@@ -35,6 +173,7 @@ class AuditlogLogLineView(models.Model):
             alogl.write_date,
             alogl.field_id,
             alogl.log_id,
+            alogl.log_id AS log_view_id,
             alogl.old_value,
             alogl.new_value,
             alogl.old_value_text,
@@ -59,6 +198,50 @@ class AuditlogLogLineView(models.Model):
             JOIN auditlog_log alog ON alog.id = alogl.log_id
         """
 
+    def _archive_select_query(self):
+        # The archived logs, HTTP requests and sessions may have been deleted
+        # since: they are not referenced
+        return """
+            alogl.id,
+            alogl.create_date,
+            alogl.create_uid,
+            alogl.write_uid,
+            alogl.write_date,
+            alogl.field_id,
+            NULL::integer AS log_id,
+            alogl.log_id AS log_view_id,
+            alogl.old_value,
+            alogl.new_value,
+            alogl.old_value_text,
+            alogl.new_value_text,
+            alogl.field_name,
+            alogl.field_description,
+            alog.name,
+            alog.model_id,
+            alog.model_name,
+            alog.model_model,
+            alog.res_id,
+            alog.user_id,
+            alog.method,
+            asession.id AS http_session_id,
+            arequest.id AS http_request_id,
+            alog.log_type
+        """
+
+    def _archive_from_query(self):
+        return f"""
+            {ARCHIVE_LINE_TABLE} alogl
+            JOIN {ARCHIVE_LOG_TABLE} alog ON alog.id = alogl.log_id
+            LEFT JOIN auditlog_http_session asession
+                ON asession.id = alog.http_session_id
+            LEFT JOIN auditlog_http_request arequest
+                ON arequest.id = alog.http_request_id
+        """
+
     @property
     def _table_query(self):
-        return f"SELECT {self._select_query()} FROM {self._from_query()}"
+        return (
+            f"SELECT {self._select_query()} FROM {self._from_query()} "
+            f"UNION ALL "
+            f"SELECT {self._archive_select_query()} FROM {self._archive_from_query()}"
+        )
@@ -0,0 +1,77 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import fields, models
+
+from .auditlog_log_line_view import ARCHIVE_LOG_TABLE
+
+
+class AuditlogLogView(models.Model):
+    _name = "auditlog.log.view"
+    _inherit = "auditlog.log"
+    _description = "Auditlog - Log (archived logs included)"
+    _auto = False
+    _log_access = True
+
+    line_ids = fields.One2many(
+        "auditlog.log.line.view", "log_view_id", string="Fields updated"
+    )
+    archived = fields.Boolean(readonly=True)
+
+    def _select_query(self):
+        return """
+            alog.id,
+            alog.create_uid,
+            alog.create_date,
+            alog.write_uid,
+            alog.write_date,
+            alog.name,
+            alog.model_id,
+            alog.model_name,
+            alog.model_model,
+            alog.res_id,
+            alog.user_id,
+            alog.method,
+            alog.http_session_id,
+            alog.http_request_id,
+            alog.log_type,
+            FALSE AS archived
+        """
+
+    def _archive_select_query(self):
+        # The HTTP requests and sessions may have been deleted since the logs
+        # were archived: they are not referenced
+        return """
+            alog.id,
+            alog.create_uid,
+            alog.create_date,
+            alog.write_uid,
+            alog.write_date,
+            alog.name,
+            alog.model_id,
+            alog.model_name,
+            alog.model_model,
+            alog.res_id,
+            alog.user_id,
+            alog.method,
+            asession.id AS http_session_id,
+            arequest.id AS http_request_id,
+            alog.log_type,
+            TRUE AS archived
+        """
+
+    def _archive_from_query(self):
+        return f"""
+            {ARCHIVE_LOG_TABLE} alog
+            LEFT JOIN auditlog_http_session asession
+                ON asession.id = alog.http_session_id
+            LEFT JOIN auditlog_http_request arequest
+                ON arequest.id = alog.http_request_id
+        """
+
+    @property
+    def _table_query(self):
+        return (
+            f"SELECT {self._select_query()} FROM auditlog_log alog "
+            f"UNION ALL "
+            f"SELECT {self._archive_select_query()} FROM {self._archive_from_query()}"
+        )
@@ -1,12 +1,35 @@
 # Copyright 2016 ABF OSIELL <https://osiell.com>
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import json
 import logging
+import threading
+import time
 from datetime import datetime, timedelta
 
+from dateutil.relativedelta import relativedelta
+
 from odoo import api, fields, models
+from odoo.tools import SQL
+
+from .auditlog_log_line_view import (
+    ARCHIVE_LINE_COLUMNS,
+    ARCHIVE_LINE_TABLE,
+    ARCHIVE_LOG_COLUMNS,
+    ARCHIVE_LOG_TABLE,
+)
 
 _logger = logging.getLogger(__name__)
 
+# Tables emptied by the batched autovacuum, in that order: lines first so that
+# deleting a log never cascades on an unbounded number of lines
+BATCH_VACUUM_MODELS = (
+    "auditlog.log.line",
+    "auditlog.log",
+    "auditlog.http.request",
+    "auditlog.http.session",
+)
+CHECKPOINTS_PARAM = "auditlog.autovacuum_batch_checkpoints"
+
 
 class AuditlogAutovacuum(models.TransientModel):
     _name = "auditlog.autovacuum"
@@ -34,3 +57,229 @@ class AuditlogAutovacuum(models.TransientModel):
             records.unlink()
             _logger.info("AUTOVACUUM - %s '%s' records deleted", nb_records, data_model)
         return True
+
+    @api.model
+    def autovacuum_batch(self, days, batch_size=10000, time_limit=None):
+        """Delete all logs older than ``days`` in SQL batches of at most
+        ``batch_size`` rows, committing after each batch. This includes:
+            - log lines
+            - CRUD logs (create, read, write, unlink)
+            - HTTP requests
+            - HTTP user sessions
+
+        The oldest rows are deleted first, walking the ``create_date`` index
+        of each table. Once ``time_limit`` seconds are elapsed, no new batch
+        is started and the next run resumes where this one stopped.
+
+        Called from a cron.
+        """
+        days = (days > 0) and int(days) or 0
+        deadline = datetime.now() - timedelta(days=days)
+        started = time.monotonic()
+        config_parameter = self.env["ir.config_parameter"].sudo()
+        saved_checkpoints = config_parameter.get_param(CHECKPOINTS_PARAM, "{}")
+        checkpoints = json.loads(saved_checkpoints)
+        timed_out = False
+        for data_model in BATCH_VACUUM_MODELS:
+            table = self.env[data_model]._table
+            table_started = time.monotonic()
+            nb_records = 0
+            while not timed_out:
+                nb_deleted, checkpoint = self._vacuum_batch(
+                    table, deadline, batch_size, checkpoints.get(table)
+                )
+                nb_records += nb_deleted
+                # Once the table is done, restart from its oldest rows on the
+                # next run so that late committed rows are not skipped
+                checkpoints[table] = checkpoint if nb_deleted == batch_size else None
+                self._autovacuum_commit()
+                if nb_deleted < batch_size:
+                    break
+                timed_out = bool(time_limit) and (
+                    time.monotonic() - started >= time_limit
+                )
+            self.env[data_model].invalidate_model()
+            duration = time.monotonic() - table_started
+            _logger.info(
+                "AUTOVACUUM - %s '%s' records deleted in %.1fs (%.0f rows/s)",
+                nb_records,
+                data_model,
+                duration,
+                nb_records / duration if duration else 0.0,
+            )
+            if timed_out:
+                _logger.info("AUTOVACUUM - time limit reached, resuming next run")
+                break
+        if json.dumps(checkpoints) != saved_checkpoints:
+            config_parameter.set_param(CHECKPOINTS_PARAM, json.dumps(checkpoints))
+            self._autovacuum_commit()
+        return True
+
+    @api.model
+    def _vacuum_batch(self, table, deadline, batch_size, checkpoint=None):
+        """Delete the ``batch_size`` oldest rows of ``table`` created before
+        ``deadline``, and after ``checkpoint`` if given. Returns the number of
+        rows deleted and the creation date of the most recent one.
+        """
+        if checkpoint:
+            after_checkpoint = SQL("create_date >= %s", checkpoint)
+        else:
+            after_checkpoint = SQL("TRUE")
+        self.env.cr.execute(
+            SQL(
+                """
+                WITH batch AS (
+                    SELECT id FROM %(table)s
+                    WHERE %(after_checkpoint)s AND create_date <= %(deadline)s
+                    ORDER BY create_date, id
+                    LIMIT %(batch_size)s
+                ), deleted AS (
+                    DELETE FROM %(table)s WHERE id IN (SELECT id FROM batch)
+                    RETURNING create_date
+                )
+                SELECT count(*), max(create_date) FROM deleted
+                """,
+                table=SQL.identifier(table),
+                after_checkpoint=after_checkpoint,
+                deadline=deadline,
+                batch_size=batch_size,
+            )
+        )
+        nb_deleted, last_date = self.env.cr.fetchone()
+        return nb_deleted, last_date and fields.Datetime.to_string(last_date)
+
+    @api.model
+    def _autovacuum_commit(self):
+        """Commit the work of `autovacuum_batch` so far, except during tests."""
+        if not getattr(threading.current_thread(), "testing", False):
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+
+    @api.model
+    def archive_logs(self, days, batch_size=1000, time_limit=None):
+        """Move the logs older than ``days`` and their lines from the audit
+        tables to the monthly partitions of the archive tables, in SQL batches
+        of ``batch_size`` logs, committing after each batch. The archived lines
+        are still listed by the `auditlog.log.line.view` model.
+
+        Once ``time_limit`` seconds are elapsed, no new batch is started.
+
+        Called from a cron.
+        """
+        days = (days > 0) and int(days) or 0
+        deadline = datetime.now() - timedelta(days=days)
+        started = time.monotonic()
+        self.env.cr.execute(
+            """
+            SELECT LEAST(
+                (SELECT min(create_date) FROM auditlog_log),
+                (SELECT min(create_date) FROM auditlog_log_line)
+            )
+            """
+        )
+        oldest = self.env.cr.fetchone()[0]
+        if not oldest or oldest > deadline:
+            return True
+        # Rows are moved along with their log, whatever their own date
+        month = oldest.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        while month <= datetime.now():
+            next_month = month + relativedelta(months=1)
+            self.env["auditlog.log.line.view"]._create_archive_partition(
+                month, next_month
+            )
+            month = next_month
+        self._autovacuum_commit()
+        nb_logs = nb_lines = 0
+        while True:
+            self.env.cr.execute(
+                SQL(
+                    """
+                    WITH batch AS (
+                        SELECT id FROM auditlog_log
+                        WHERE create_date <= %(deadline)s
+                        ORDER BY create_date, id
+                        LIMIT %(batch_size)s
+                    ), archived_logs AS (
+                        INSERT INTO %(log_archive)s (%(log_columns)s)
+                        SELECT %(log_columns)s FROM auditlog_log
+                        WHERE id IN (SELECT id FROM batch)
+                        RETURNING 1
+                    ), archived_lines AS (
+                        INSERT INTO %(line_archive)s (%(line_columns)s)
+                        SELECT %(line_values)s
+                        FROM auditlog_log_line alogl
+                        JOIN auditlog_log alog ON alog.id = alogl.log_id
+                        WHERE alogl.log_id IN (SELECT id FROM batch)
+                        RETURNING 1
+                    ), deleted AS (
+                        DELETE FROM auditlog_log WHERE id IN (SELECT id FROM batch)
+                    )
+                    SELECT
+                        (SELECT count(*) FROM archived_logs),
+                        (SELECT count(*) FROM archived_lines)
+                    """,
+                    deadline=deadline,
+                    batch_size=batch_size,
+                    log_archive=SQL.identifier(ARCHIVE_LOG_TABLE),
+                    log_columns=SQL(", ").join(
+                        SQL.identifier(column) for column in ARCHIVE_LOG_COLUMNS
+                    ),
+                    line_archive=SQL.identifier(ARCHIVE_LINE_TABLE),
+                    line_columns=SQL(", ").join(
+                        SQL.identifier(column) for column in ARCHIVE_LINE_COLUMNS
+                    ),
+                    # The archive is partitioned on a NOT NULL create_date:
+                    # lines without one are filed under the date of their log
+                    line_values=SQL(", ").join(
+                        SQL("COALESCE(alogl.create_date, alog.create_date)")
+                        if column == "create_date"
+                        else SQL.identifier("alogl", column)
+                        for column in ARCHIVE_LINE_COLUMNS
+                    ),
+                )
+            )
+            batch_logs, batch_lines = self.env.cr.fetchone()
+            nb_logs += batch_logs
+            nb_lines += batch_lines
+            self._autovacuum_commit()
+            if batch_logs < batch_size or (
+                time_limit and time.monotonic() - started >= time_limit
+            ):
+                break
+        self.env["auditlog.log"].invalidate_model()
+        self.env["auditlog.log.line"].invalidate_model()
+        duration = time.monotonic() - started
+        _logger.info(
+            "AUTOVACUUM - %s logs and %s lines archived in %.1fs (%.0f rows/s)",
+            nb_logs,
+            nb_lines,
+            duration,
+            (nb_logs + nb_lines) / duration if duration else 0.0,
+        )
+        return True
+
+    @api.model
+    def drop_archived_logs(self, months):
+        """Delete the archived logs older than ``months`` months, by dropping
+        the partitions of the archive tables.
+
+        Called from a cron.
+        """
+        months = (months > 0) and int(months) or 0
+        limit = (datetime.now() - relativedelta(months=months)).strftime("%Y_%m")
+        for table in (ARCHIVE_LINE_TABLE, ARCHIVE_LOG_TABLE):
+            self.env.cr.execute(
+                """
+                SELECT child.relname
+                FROM pg_inherits
+                JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE parent.relname = %s
+                """,
+                (table,),
+            )
+            for (partition,) in self.env.cr.fetchall():
+                # Partitions are suffixed with their month: YYYY_MM
+                if partition[-7:] < limit:
+                    self.env.cr.execute(SQL("DROP TABLE %s", SQL.identifier(partition)))
+                    _logger.info("AUTOVACUUM - archive partition %s dropped", partition)
+        return True
@@ -1,10 +1,11 @@
 # Copyright 2015 ABF OSIELL <https://osiell.com>
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
-from psycopg2.extensions import AsIs
-
 from odoo import api, fields, models
 from odoo.http import request
+from odoo.tools.sql import create_index
+
+from .http_session import existing_cached_id
 
 
 class AuditlogHTTPRequest(models.Model):
@@ -22,6 +23,15 @@ class AuditlogHTTPRequest(models.Model):
     user_context = fields.Char("Context")
     log_ids = fields.One2many("auditlog.log", "http_request_id", string="Logs")
 
+    def init(self):
+        # Used by the batched autovacuum to walk the rows from the oldest ones
+        create_index(
+            self.env.cr,
+            "auditlog_http_request_create_date_id_index",
+            self._table,
+            ["create_date", "id"],
+        )
+
     @api.depends("create_date", "name")
     def _compute_display_name(self):
         for httprequest in self:
@@ -50,11 +60,7 @@ class AuditlogHTTPRequest(models.Model):
             if hasattr(httprequest, "auditlog_http_request_id"):
                 # Verify existence. Could have been rolled back after a
                 # concurrency error
-                self.env.cr.execute(
-                    "SELECT id FROM %s WHERE id = %s",
-                    (AsIs(self._table), httprequest.auditlog_http_request_id),
-                )
-                if self.env.cr.fetchone():
+                if existing_cached_id(self, httprequest.auditlog_http_request_id):
                     return httprequest.auditlog_http_request_id
             vals = {
                 "name": httprequest.path,
@@ -3,6 +3,24 @@
 
 from odoo import api, fields, models
 from odoo.http import request
+from odoo.tools.lru import LRU
+from odoo.tools.sql import create_index
+
+# Session log ID of each (database, session ID, user ID), shared by the
+# requests handled by this worker
+SESSION_ID_CACHE = LRU(1024)
+
+
+def existing_cached_id(model, record_id):
+    """Return `record_id` if the record of `model` still exists, else `False`.
+    It is only checked in database once per transaction cache: the record can
+    have been rolled back after a concurrency error or vacuumed since.
+    """
+    record = model.browse(record_id)
+    name_field = model._fields["name"]
+    if not model.env.cache.contains(record, name_field):
+        record.fetch(["name"])
+    return record_id if model.env.cache.contains(record, name_field) else False
 
 
 class AuditlogtHTTPSession(models.Model):
@@ -17,6 +35,15 @@ class AuditlogtHTTPSession(models.Model):
         "auditlog.http.request", "http_session_id", string="HTTP Requests"
     )
 
+    def init(self):
+        # Used by the batched autovacuum to walk the rows from the oldest ones
+        create_index(
+            self.env.cr,
+            "auditlog_http_session_create_date_id_index",
+            self._table,
+            ["create_date", "id"],
+        )
+
     @api.depends("create_date", "user_id")
     def _compute_display_name(self):
         for httpsession in self:
@@ -42,12 +69,26 @@ class AuditlogtHTTPSession(models.Model):
             return False
         httpsession = request.session
         if httpsession:
-            existing_session = self.search(
-                [("name", "=", httpsession.sid), ("user_id", "=", request.uid)], limit=1
-            )
-            if existing_session:
-                return existing_session.id
-            vals = {"name": httpsession.sid, "user_id": request.uid}
-            httpsession.auditlog_http_session_id = self.create(vals).id
-            return httpsession.auditlog_http_session_id
+            httprequest = request.httprequest
+            key = (self.env.cr.dbname, httpsession.sid, request.uid)
+            # Resolved once per HTTP request, then per worker
+            cached = getattr(httprequest, "auditlog_http_session", None)
+            session_id = cached[1] if cached and cached[0] == key else None
+            if session_id is None:
+                session_id = SESSION_ID_CACHE.get(key)
+            if session_id:
+                session_id = existing_cached_id(self, session_id)
+            if not session_id:
+                existing_session = self.search(
+                    [("name", "=", httpsession.sid), ("user_id", "=", request.uid)],
+                    limit=1,
+                )
+                if not existing_session:
+                    vals = {"name": httpsession.sid, "user_id": request.uid}
+                    existing_session = self.create(vals)
+                session_id = existing_session.id
+            SESSION_ID_CACHE[key] = session_id
+            if httprequest:
+                httprequest.auditlog_http_session = (key, session_id)
+            return session_id
         return False
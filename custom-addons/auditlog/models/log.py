@@ -2,6 +2,7 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 from odoo import _, api, fields, models
 from odoo.exceptions import UserError
+from odoo.tools.sql import create_index
 
 
 class AuditlogLog(models.Model):
@@ -29,13 +30,36 @@ class AuditlogLog(models.Model):
         [("full", "Full log"), ("fast", "Fast log")], string="Type"
     )
 
+    def init(self):
+        # Used by the batched autovacuum to walk the logs from the oldest ones
+        create_index(
+            self.env.cr,
+            "auditlog_log_create_date_id_index",
+            "auditlog_log",
+            ["create_date", "id"],
+        )
+
     @api.model_create_multi
     def create(self, vals_list):
         """Insert model_name and model_model field values upon creation."""
         for vals in vals_list:
             if not vals.get("model_id"):
                 raise UserError(_("No model defined to create log."))
-            model = self.env["ir.model"].sudo().browse(vals["model_id"])
+        # Values prepared by the rules already hold the model names, read the
+        # models of the other ones at once
+        vals_to_complete = [
+            vals
+            for vals in vals_list
+            if "model_name" not in vals or "model_model" not in vals
+        ]
+        models_by_id = {
+            model.id: model
+            for model in self.env["ir.model"]
+            .sudo()
+            .browse({vals["model_id"] for vals in vals_to_complete})
+        }
+        for vals in vals_to_complete:
+            model = models_by_id[vals["model_id"]]
             vals.update({"model_name": model.name, "model_model": model.model})
         return super().create(vals_list)
 
@@ -67,6 +91,16 @@ class AuditlogLogLine(models.Model):
     field_name = fields.Char("Technical name", readonly=True)
     field_description = fields.Char("Description", readonly=True)
 
+    def init(self):
+        # Used by the batched autovacuum to walk the lines from the oldest ones.
+        # The table is explicit as `auditlog.log.line.view` inherits this.
+        create_index(
+            self.env.cr,
+            "auditlog_log_line_create_date_id_index",
+            "auditlog_log_line",
+            ["create_date", "id"],
+        )
+
     @api.model_create_multi
     def create(self, vals_list):
         """Ensure field_id is not empty on creation and store field_name and
@@ -74,7 +108,21 @@ class AuditlogLogLine(models.Model):
         for vals in vals_list:
             if not vals.get("field_id"):
                 raise UserError(_("No field defined to create line."))
-            field = self.env["ir.model.fields"].sudo().browse(vals["field_id"])
+        # Values prepared by the rules already hold the field names, read the
+        # fields of the other ones at once
+        vals_to_complete = [
+            vals
+            for vals in vals_list
+            if "field_name" not in vals or "field_description" not in vals
+        ]
+        fields_by_id = {
+            field.id: field
+            for field in self.env["ir.model.fields"]
+            .sudo()
+            .browse({vals["field_id"] for vals in vals_to_complete})
+        }
+        for vals in vals_to_complete:
+            field = fields_by_id[vals["field_id"]]
             vals.update(
                 {"field_name": field.name, "field_description": field.field_description}
             )
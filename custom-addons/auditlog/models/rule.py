@@ -2,9 +2,14 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
 import copy
+import pickle
+from collections import defaultdict
 
-from odoo import Command, _, api, fields, models
+import psycopg2
+
+from odoo import Command, _, api, fields, models, tools
 from odoo.exceptions import UserError
+from odoo.tools import SQL
 
 FIELDS_BLACKLIST = [
     "id",
@@ -15,6 +20,19 @@ FIELDS_BLACKLIST = [
     "display_name",
     "__last_update",
 ]
+# Rule fields deciding which ORM methods are patched: changing them needs a
+# registry reload on all the workers
+REGISTRY_FIELDS = (
+    "model_id",
+    "state",
+    "log_create",
+    "log_read",
+    "log_write",
+    "log_unlink",
+)
+# Temporary table (per connection, dropped at commit) holding the values of
+# the logs of rules with 'deferred_write' until the transaction is committed
+LOG_BUFFER_TABLE = "auditlog_log_buffer"
 # Used for performance, to avoid a dictionary instanciation when we need an
 # empty dict to simplify algorithms
 EMPTY_DICT = {}
@@ -137,6 +155,14 @@ class AuditlogRule(models.Model):
         domain="[('model_id', '=', model_id)]",
         string="Fields to Exclude",
     )
+    deferred_write = fields.Boolean(
+        help=(
+            "Select this to keep the logs of a transaction in memory and "
+            "insert them in bulk when the transaction is committed, instead "
+            "of creating them along with each operation. Logs of operations "
+            "rolled back to a savepoint are discarded with them."
+        ),
+    )
 
     _sql_constraints = [
         (
@@ -152,14 +178,94 @@ class AuditlogRule(models.Model):
     def _register_hook(self):
         """Get all rules and apply them to log method calls."""
         super()._register_hook()
-        if not hasattr(self.pool, "_auditlog_field_cache"):
-            self.pool._auditlog_field_cache = {}
         if not hasattr(self.pool, "_auditlog_model_cache"):
             self.pool._auditlog_model_cache = {}
+        if not hasattr(self.pool, "_auditlog_rule_index"):
+            self.pool._auditlog_rule_index = {}
+            self.pool._auditlog_rule_index_stats = {"hits": 0, "misses": 0}
         if not self:
             self = self.search([("state", "=", "subscribed")])
+            self._build_rule_index()
         return self._patch_methods()
 
+    def _build_rule_index(self):
+        """Index the settings and the field metadata of the rules by model,
+        so that logging an operation does not query them.
+        """
+        index = self.pool._auditlog_rule_index
+        for rule in self:
+            if rule.model_id and self.pool.get(rule.model_id.model):
+                index[rule.model_id.id] = rule._prepare_rule_index_entry(rule.model_id)
+
+    def _prepare_rule_index_entry(self, model):
+        """Return the index entry of `model`, ``self`` being its rule (or an
+        empty recordset if it has none).
+        """
+        # Search the fields in the current model and those it inherits, the
+        # fields of the current model taking precedence
+        model_fields = (
+            self.env["ir.model.fields"]
+            .sudo()
+            .search([("model_id", "in", model.ids + model.inherited_model_ids.ids)])
+            .read(load="_classic_write")
+        )
+        model_fields.sort(key=lambda field: field["model_id"] == model.id)
+        return {
+            "rule_id": self.id,
+            "model_name": model.name,
+            "model_model": model.model,
+            "log_type": self.log_type,
+            "capture_record": self.capture_record,
+            "deferred_write": self.deferred_write,
+            "fields_to_exclude": self.fields_to_exclude_ids.mapped("name"),
+            "fields": {field["name"]: field for field in model_fields},
+        }
+
+    def _get_rule_index_entry(self, model_id):
+        """Return the index entry of the model `model_id`, building it if the
+        index has been invalidated since.
+        """
+        index = self.pool._auditlog_rule_index
+        stats = self.pool._auditlog_rule_index_stats
+        # Rule changes of other workers that do not reload the registry are
+        # signaled through the ormcache invalidation
+        token = self._rule_index_token()
+        if getattr(self.pool, "_auditlog_rule_index_token", None) is not token:
+            index.clear()
+            self.pool._auditlog_rule_index_token = token
+        entry = index.get(model_id)
+        if entry is None:
+            stats["misses"] += 1
+            model = self.env["ir.model"].sudo().browse(model_id)
+            rule = self.env["auditlog.rule"].search([("model_id", "=", model_id)])
+            entry = index[model_id] = rule._prepare_rule_index_entry(model)
+        else:
+            stats["hits"] += 1
+        return entry
+
+    @api.model
+    @tools.ormcache()
+    def _rule_index_token(self):
+        """Object identifying the current version of the rule index, renewed
+        whenever the ormcache is cleared, see `_invalidate_rule_index`.
+        """
+        return object()
+
+    def _invalidate_rule_index(self):
+        """Invalidate the rule index of all the workers, without reloading
+        the registry.
+        """
+        self.pool._auditlog_rule_index.clear()
+        self.env.registry.clear_cache()
+
+    @api.model
+    def get_rule_index_stats(self):
+        """Return the hit/miss counts of the rule index of this worker since
+        the registry was loaded, and the number of models it holds.
+        """
+        stats = self.pool._auditlog_rule_index_stats
+        return dict(stats, models=len(self.pool._auditlog_rule_index))
+
     def _patch_method(self, model, method_name, check_attr):
         result = new_method = False
         model_class = type(model)
@@ -234,9 +340,12 @@ class AuditlogRule(models.Model):
             model = self.env["ir.model"].sudo().browse(vals["model_id"])
             vals.update({"model_name": model.name, "model_model": model.model})
         new_records = super().create(vals_list)
-        updated = [record._register_hook() for record in new_records]
-        if any(updated):
+        for record in new_records:
+            record._register_hook()
+        if new_records.filtered(lambda rule: rule.state == "subscribed"):
             self._update_registry()
+        else:
+            self._invalidate_rule_index()
         return new_records
 
     def write(self, vals):
@@ -246,15 +355,24 @@ class AuditlogRule(models.Model):
                 raise UserError(_("Field 'model_id' cannot be empty."))
             model = self.env["ir.model"].sudo().browse(vals["model_id"])
             vals.update({"model_name": model.name, "model_model": model.model})
+        registry_fields = [name for name in REGISTRY_FIELDS if name in vals]
+        old_values = registry_fields and self.read(registry_fields, load=None)
         res = super().write(vals)
-        if self._register_hook():
+        self._register_hook()
+        # Only the patched methods need a registry reload, the other settings
+        # are read from the rule index
+        if registry_fields and self.read(registry_fields, load=None) != old_values:
             self._update_registry()
+        else:
+            self._invalidate_rule_index()
         return res
 
     def unlink(self):
         """Unsubscribe rules before removing them."""
         self.unsubscribe()
-        return super().unlink()
+        res = super().unlink()
+        self._invalidate_rule_index()
+        return res
 
     @api.model
     def get_auditlog_fields(self, model):
@@ -513,73 +631,201 @@ class AuditlogRule(models.Model):
         http_session_model = self.env["auditlog.http.session"]
         model_model = self.env[res_model]
         model_id = self.pool._auditlog_model_cache[res_model]
-        auditlog_rule = self.env["auditlog.rule"].search([("model_id", "=", model_id)])
-        fields_to_exclude = auditlog_rule.fields_to_exclude_ids.mapped("name")
+        rule_data = self._get_rule_index_entry(model_id)
+        fields_to_exclude = rule_data["fields_to_exclude"]
+        http_request_id = http_request_model.current_http_request()
+        http_session_id = http_session_model.current_http_session()
+        # Compute the display names of the whole batch at once
+        names = {res.id: res.display_name for res in model_model.browse(res_ids)}
+        # Collect the fields to log on each record first, to resolve the
+        # display names of their x2many values for the whole batch at once
+        fields_by_res_id = {}
+        for res_id in res_ids:
+            diff = DictDiffer(
+                new_values.get(res_id, EMPTY_DICT), old_values.get(res_id, EMPTY_DICT)
+            )
+            if method == "create":
+                fields_by_res_id[res_id] = diff.added()
+            elif method == "write":
+                fields_by_res_id[res_id] = diff.changed()
+            elif method == "read" or (
+                method == "unlink" and rule_data["capture_record"]
+            ):
+                fields_by_res_id[res_id] = list(
+                    old_values.get(res_id, EMPTY_DICT).keys()
+                )
+        display_names = self._get_x2many_display_names(
+            model_id,
+            method,
+            (additional_log_values or EMPTY_DICT).get("log_type"),
+            fields_by_res_id,
+            old_values,
+            new_values,
+            fields_to_exclude,
+        )
+        log_vals_list = []
         for res_id in res_ids:
-            res = model_model.browse(res_id)
             vals = {
-                "name": res.display_name,
+                "name": names[res_id],
                 "model_id": model_id,
+                "model_name": rule_data["model_name"],
+                "model_model": rule_data["model_model"],
                 "res_id": res_id,
                 "method": method,
                 "user_id": uid,
-                "http_request_id": http_request_model.current_http_request(),
-                "http_session_id": http_session_model.current_http_session(),
+                "http_request_id": http_request_id,
+                "http_session_id": http_session_id,
             }
             vals.update(additional_log_values or {})
-            diff = DictDiffer(
-                new_values.get(res_id, EMPTY_DICT), old_values.get(res_id, EMPTY_DICT)
-            )
+            fields_list = fields_by_res_id.get(res_id)
             if method == "create":
                 vals["line_ids"] = self._create_log_line_on_create(
-                    vals, diff.added(), new_values, fields_to_exclude
-                )
-            elif method == "read":
-                vals["line_ids"] = self._create_log_line_on_read(
                     vals,
-                    list(old_values.get(res_id, EMPTY_DICT).keys()),
-                    old_values,
+                    fields_list,
+                    new_values,
                     fields_to_exclude,
+                    display_names=display_names,
                 )
             elif method == "write":
                 vals["line_ids"] = self._create_log_line_on_write(
-                    vals, diff.changed(), old_values, new_values, fields_to_exclude
+                    vals,
+                    fields_list,
+                    old_values,
+                    new_values,
+                    fields_to_exclude,
+                    display_names=display_names,
                 )
-            elif method == "unlink" and auditlog_rule.capture_record:
+            elif fields_list is not None:
                 vals["line_ids"] = self._create_log_line_on_read(
                     vals,
-                    list(old_values.get(res_id, EMPTY_DICT).keys()),
+                    fields_list,
                     old_values,
                     fields_to_exclude,
+                    display_names=display_names,
                 )
             if method == "unlink" or vals.get("line_ids", {}):
-                log_model.create(vals)
+                log_vals_list.append(vals)
+        if not log_vals_list:
+            return
+        if rule_data["deferred_write"]:
+            self._buffer_logs(log_vals_list)
+        else:
+            log_model.create(log_vals_list)
 
-    def _get_field(self, model_id, field_name):
-        model = self.env["ir.model"].sudo().browse(model_id)
-        cache = self.pool._auditlog_field_cache
-        if field_name not in cache.get(model.model, {}):
-            cache.setdefault(model.model, {})
-            # - we use 'search()' then 'read()' instead of the 'search_read()'
-            #   to take advantage of the 'classic_write' loading
-            # - search the field in the current model and those it inherits
-            field_model = self.env["ir.model.fields"].sudo()
-            all_model_ids = [model.id]
-            all_model_ids.extend(model.inherited_model_ids.ids)
-            field = field_model.search(
-                [("model_id", "in", all_model_ids), ("name", "=", field_name)]
+    def _get_x2many_display_names(
+        self,
+        model_id,
+        method,
+        log_type,
+        fields_by_res_id,
+        old_values,
+        new_values,
+        fields_to_exclude,
+    ):
+        """Resolve the display names of the records referenced by the x2many
+        fields to log for a batch of records, with one existence check and
+        one display name computation per comodel. Returns a dictionary
+        {COMODEL: {ID: DISPLAY_NAME}}, the records deleted in between are
+        missing from it.
+        """
+        if method in ("create", "write") and log_type != "full":
+            return {}
+        fields_to_exclude = fields_to_exclude + FIELDS_BLACKLIST
+        ids_to_name = defaultdict(set)
+        ids_to_check = defaultdict(set)
+        for res_id, fields_list in fields_by_res_id.items():
+            for field_name in fields_list:
+                if field_name in fields_to_exclude:
+                    continue
+                field = self._get_field(model_id, field_name)
+                if not field or not field["relation"] or "2many" not in field["ttype"]:
+                    continue
+                relation = field["relation"]
+                if method == "write":
+                    ids_to_check[relation].update(old_values[res_id][field_name])
+                    ids_to_name[relation].update(new_values[res_id][field_name])
+                elif method == "create":
+                    ids_to_name[relation].update(new_values[res_id][field_name])
+                else:
+                    ids_to_name[relation].update(old_values[res_id][field_name])
+        return {
+            relation: self._resolve_display_names(
+                relation, ids_to_name[relation], ids_to_check[relation]
+            )
+            for relation in ids_to_name.keys() | ids_to_check.keys()
+        }
+
+    def _resolve_display_names(self, relation, ids, ids_to_check=()):
+        """Return {ID: DISPLAY_NAME} for the records of model `relation`
+        with `ids`, plus those of `ids_to_check` still existing.
+        """
+        comodel = self.env[relation]
+        ids = set(ids)
+        if ids_to_check:
+            # Filter IDs to prevent a 'display_name' call on deleted resources
+            ids.update(comodel._search([("id", "in", list(ids_to_check))]))
+        return {record.id: record.display_name for record in comodel.browse(ids)}
+
+    def _buffer_logs(self, log_vals_list):
+        """Keep the values of logs to create until the transaction is
+        committed, see `_flush_log_buffer`.
+
+        The values are kept in a temporary table rather than in memory: the
+        ones buffered inside a savepoint are discarded by PostgreSQL when the
+        savepoint is rolled back, like the operations they describe.
+        """
+        cr = self.env.cr
+        # Created again if a savepoint rollback dropped it
+        cr.execute(
+            SQL(
+                "CREATE TEMPORARY TABLE IF NOT EXISTS %s "
+                "(id serial, vals bytea NOT NULL) ON COMMIT DROP",
+                SQL.identifier(LOG_BUFFER_TABLE),
+            )
+        )
+        cr.execute(
+            SQL(
+                "INSERT INTO %s (vals) VALUES %s",
+                SQL.identifier(LOG_BUFFER_TABLE),
+                SQL(", ").join(
+                    SQL("(%s)", psycopg2.Binary(pickle.dumps(vals)))
+                    for vals in log_vals_list
+                ),
+            )
+        )
+        if not cr.precommit.data.get("auditlog.log.buffer"):
+            cr.precommit.data["auditlog.log.buffer"] = True
+            cr.precommit.add(self._flush_log_buffer)
+
+    def _flush_log_buffer(self):
+        """Create all the buffered logs and their lines in one batch."""
+        cr = self.env.cr
+        cr.precommit.data.pop("auditlog.log.buffer", None)
+        cr.execute("SELECT to_regclass(%s)", [f"pg_temp.{LOG_BUFFER_TABLE}"])
+        if not cr.fetchone()[0]:
+            return
+        cr.execute(
+            SQL(
+                "DELETE FROM %s RETURNING id, vals", SQL.identifier(LOG_BUFFER_TABLE)
             )
-            # The field can be a dummy one, like 'in_group_X' on 'res.users'
-            # As such we can't log it (field_id is required to create a log)
-            if not field:
-                cache[model.model][field_name] = False
-            else:
-                field_data = field.read(load="_classic_write")[0]
-                cache[model.model][field_name] = field_data
-        return cache[model.model][field_name]
+        )
+        rows = sorted(cr.fetchall())
+        if rows:
+            # Only this connection writes (and reads) its temporary table
+            log_vals_list = [pickle.loads(vals) for __, vals in rows]  # nosec
+            self.env["auditlog.log"].sudo().create(log_vals_list)
+            self.env.flush_all()
+
+    def _get_field(self, model_id, field_name):
+        entry = self.pool._auditlog_rule_index.get(model_id)
+        if entry is None:
+            entry = self._get_rule_index_entry(model_id)
+        # The field can be a dummy one, like 'in_group_X' on 'res.users'
+        # As such we can't log it (field_id is required to create a log)
+        return entry["fields"].get(field_name, False)
 
     def _create_log_line_on_read(
-        self, log_vals, fields_list, read_values, fields_to_exclude
+        self, log_vals, fields_list, read_values, fields_to_exclude, display_names=None
     ):
         """Log field filled on a 'read' operation."""
         fields_to_exclude = fields_to_exclude + FIELDS_BLACKLIST
@@ -593,32 +839,47 @@ class AuditlogRule(models.Model):
                 line_vals.append(
                     Command.create(
                         self._prepare_log_line_vals_on_read(
-                            log_vals, field, read_values
+                            log_vals, field, read_values, display_names=display_names
                         )
                     )
                 )
         return line_vals
 
-    def _prepare_log_line_vals_on_read(self, log_vals, field, read_values):
+    def _prepare_log_line_vals_on_read(
+        self, log_vals, field, read_values, display_names=None
+    ):
         """Prepare the dictionary of values used to create a log line on a
-        'read' operation.
+        'read' operation. `display_names` are those resolved for the whole
+        batch by `_get_x2many_display_names`.
         """
         vals = {
             "field_id": field["id"],
+            "field_name": field["name"],
+            "field_description": field["field_description"],
             "old_value": read_values[log_vals["res_id"]][field["name"]],
             "old_value_text": read_values[log_vals["res_id"]][field["name"]],
             "new_value": False,
             "new_value_text": False,
         }
         if field["relation"] and "2many" in field["ttype"]:
-            vals["old_value_text"] = [
-                (x.id, x.display_name)
-                for x in self.env[field["relation"]].browse(vals["old_value"])
-            ]
+            if display_names is None:
+                display_names = {
+                    field["relation"]: self._resolve_display_names(
+                        field["relation"], vals["old_value"]
+                    )
+                }
+            names = display_names[field["relation"]]
+            vals["old_value_text"] = [(id_, names[id_]) for id_ in vals["old_value"]]
         return vals
 
     def _create_log_line_on_write(
-        self, log_vals, fields_list, old_values, new_values, fields_to_exclude
+        self,
+        log_vals,
+        fields_list,
+        old_values,
+        new_values,
+        fields_to_exclude,
+        display_names=None,
     ):
         """Log field updated on a 'write' operation."""
         fields_to_exclude = fields_to_exclude + FIELDS_BLACKLIST
@@ -632,18 +893,27 @@ class AuditlogRule(models.Model):
                 line_vals.append(
                     Command.create(
                         self._prepare_log_line_vals_on_write(
-                            log_vals, field, old_values, new_values
+                            log_vals,
+                            field,
+                            old_values,
+                            new_values,
+                            display_names=display_names,
                         )
                     )
                 )
         return line_vals
 
-    def _prepare_log_line_vals_on_write(self, log_vals, field, old_values, new_values):
+    def _prepare_log_line_vals_on_write(
+        self, log_vals, field, old_values, new_values, display_names=None
+    ):
         """Prepare the dictionary of values used to create a log line on a
-        'write' operation.
+        'write' operation. `display_names` are those resolved for the whole
+        batch by `_get_x2many_display_names`.
         """
         vals = {
             "field_id": field["id"],
+            "field_name": field["name"],
+            "field_description": field["field_description"],
             "old_value": old_values[log_vals["res_id"]][field["name"]],
             "old_value_text": old_values[log_vals["res_id"]][field["name"]],
             "new_value": new_values[log_vals["res_id"]][field["name"]],
@@ -655,29 +925,26 @@ class AuditlogRule(models.Model):
             and field["relation"]
             and "2many" in field["ttype"]
         ):
-            # Filter IDs to prevent a 'display_name' call on deleted resources
-            existing_ids = self.env[field["relation"]]._search(
-                [("id", "in", vals["old_value"])]
-            )
-            old_value_text = []
-            if existing_ids:
-                old_value_text = [
-                    (x.id, x.display_name)
-                    for x in self.env[field["relation"]].browse(existing_ids)
-                ]
+            if display_names is None:
+                display_names = {
+                    field["relation"]: self._resolve_display_names(
+                        field["relation"], vals["new_value"], vals["old_value"]
+                    )
+                }
+            names = display_names[field["relation"]]
+            old_value_text = [
+                (id_, names[id_]) for id_ in vals["old_value"] if id_ in names
+            ]
             # Deleted resources will have a 'DELETED' text representation
-            deleted_ids = set(vals["old_value"]) - set(existing_ids)
-            for deleted_id in deleted_ids:
-                old_value_text.append((deleted_id, "DELETED"))
+            old_value_text.extend(
+                (id_, "DELETED") for id_ in vals["old_value"] if id_ not in names
+            )
             vals["old_value_text"] = old_value_text
-            vals["new_value_text"] = [
-                (x.id, x.display_name)
-                for x in self.env[field["relation"]].browse(vals["new_value"])
-            ]
+            vals["new_value_text"] = [(id_, names[id_]) for id_ in vals["new_value"]]
         return vals
 
     def _create_log_line_on_create(
-        self, log_vals, fields_list, new_values, fields_to_exclude
+        self, log_vals, fields_list, new_values, fields_to_exclude, display_names=None
     ):
         """Log field filled on a 'create' operation."""
         fields_to_exclude = fields_to_exclude + FIELDS_BLACKLIST
@@ -691,18 +958,23 @@ class AuditlogRule(models.Model):
                 line_vals.append(
                     Command.create(
                         self._prepare_log_line_vals_on_create(
-                            log_vals, field, new_values
+                            log_vals, field, new_values, display_names=display_names
                         )
                     )
                 )
         return line_vals
 
-    def _prepare_log_line_vals_on_create(self, log_vals, field, new_values):
+    def _prepare_log_line_vals_on_create(
+        self, log_vals, field, new_values, display_names=None
+    ):
         """Prepare the dictionary of values used to create a log line on a
-        'create' operation.
+        'create' operation. `display_names` are those resolved for the whole
+        batch by `_get_x2many_display_names`.
         """
         vals = {
             "field_id": field["id"],
+            "field_name": field["name"],
+            "field_description": field["field_description"],
             "old_value": False,
             "old_value_text": False,
             "new_value": new_values[log_vals["res_id"]][field["name"]],
@@ -713,10 +985,14 @@ class AuditlogRule(models.Model):
             and field["relation"]
             and "2many" in field["ttype"]
         ):
-            vals["new_value_text"] = [
-                (x.id, x.display_name)
-                for x in self.env[field["relation"]].browse(vals["new_value"])
-            ]
+            if display_names is None:
+                display_names = {
+                    field["relation"]: self._resolve_display_names(
+                        field["relation"], vals["new_value"]
+                    )
+                }
+            names = display_names[field["relation"]]
+            vals["new_value_text"] = [(id_, names[id_]) for id_ in vals["new_value"]]
         return vals
 
     def subscribe(self):
@@ -731,7 +1007,7 @@ class AuditlogRule(models.Model):
             )
             vals = {
                 "name": _("View logs"),
-                "res_model": "auditlog.log",
+                "res_model": "auditlog.log.view",
                 "binding_model_id": rule.model_id.id,
                 "domain": domain,
             }
@@ -764,6 +1040,9 @@ class AuditlogRule(models.Model):
 
     def _update_registry(self):
         """Force a registry reload after rule change"""
+        # The rule index of this worker is rebuilt on demand, the ones of the
+        # other workers when they reload the registry
+        self.pool._auditlog_rule_index.clear()
         # this code comes from `base_automation` which has a similar need
         if self.env.registry.ready and not self.env.context.get("import_file"):
             # notify other workers
@@ -1,4 +1,5 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 from . import test_auditlog
+from . import test_auditlog_benchmark
 from . import test_autovacuum
 from . import test_multi_company
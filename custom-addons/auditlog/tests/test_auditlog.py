@@ -2,11 +2,17 @@
 # © 2018 Pieter Paulussen <pieter_paulussen@me.com>
 # © 2021 Stefan Rijnhart <stefan@opener.amsterdam>
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import contextlib
+
+from odoo.exceptions import UserError
+from odoo.fields import Command
 from odoo.tests.common import TransactionCase
 
 from odoo.addons.base.models.ir_model import MODULE_UNINSTALL_FLAG
 from odoo.addons.base.models.res_users import name_boolean_group
 
+from ..models.http_session import existing_cached_id
+
 
 class AuditlogCommon:
     def test_LogCreation(self):
@@ -768,3 +774,222 @@ class AuditlogFast_excluded_fields(TransactionCase):
                 ]
             )
         )
+
+
+class TestAuditlogDeferredWrite(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.groups_model_id = cls.env.ref("base.model_res_groups").id
+        cls.groups_rule = cls.env["auditlog.rule"].create(
+            {
+                "name": "testrule for groups with deferred write",
+                "model_id": cls.groups_model_id,
+                "log_create": True,
+                "log_write": True,
+                "log_unlink": True,
+                "log_type": "full",
+                "deferred_write": True,
+            }
+        )
+        cls.groups_rule.subscribe()
+        cls.auditlog_log = cls.env["auditlog.log"]
+
+    def test_01_logs_written_at_precommit(self):
+        groups = self.env["res.groups"].create(
+            [{"name": "testgroup1"}, {"name": "testgroup2"}]
+        )
+        groups.write({"comment": "deferred"})
+        domain = [
+            ("model_id", "=", self.groups_model_id),
+            ("res_id", "in", groups.ids),
+        ]
+        self.assertFalse(self.auditlog_log.search(domain))
+        self.env.cr.flush()
+        logs = self.auditlog_log.search(domain)
+        self.assertEqual(
+            sorted(logs.mapped("method")), ["create", "create", "write", "write"]
+        )
+        self.assertEqual(set(logs.mapped("name")), {"testgroup1", "testgroup2"})
+        write_logs = logs.filtered(lambda log: log.method == "write")
+        self.assertEqual(write_logs.line_ids.mapped("field_name"), ["comment"] * 2)
+
+    def test_02_unlink_keeps_name(self):
+        group = self.env["res.groups"].create({"name": "testgroup3"})
+        group_id = group.id
+        group.unlink()
+        self.env.cr.flush()
+        log = self.auditlog_log.search(
+            [
+                ("model_id", "=", self.groups_model_id),
+                ("method", "=", "unlink"),
+                ("res_id", "=", group_id),
+            ]
+        ).ensure_one()
+        self.assertEqual(log.name, "testgroup3")
+
+    def test_03_savepoint_rollback_discards_logs(self):
+        group = self.env["res.groups"].create({"name": "testgroup4"})
+        with contextlib.suppress(UserError), self.env.cr.savepoint():
+            group.write({"comment": "rolled back"})
+            raise UserError("rollback")
+        group.write({"comment": "kept"})
+        self.env.cr.flush()
+        logs = self.auditlog_log.search(
+            [("model_id", "=", self.groups_model_id), ("res_id", "=", group.id)]
+        )
+        self.assertEqual(sorted(logs.mapped("method")), ["create", "write"])
+        self.assertEqual(
+            logs.filtered(lambda log: log.method == "write").line_ids.new_value_text,
+            "kept",
+        )
+
+
+class TestAuditlogRuleIndex(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.groups_model_id = cls.env.ref("base.model_res_groups").id
+        cls.groups_rule = cls.env["auditlog.rule"].create(
+            {
+                "name": "testrule for groups rule index",
+                "model_id": cls.groups_model_id,
+                "log_create": True,
+                "log_write": True,
+                "log_type": "full",
+            }
+        )
+        cls.groups_rule.subscribe()
+        cls.rule_model = cls.env["auditlog.rule"]
+        cls.auditlog_log = cls.env["auditlog.log"]
+
+    def test_01_index_hit(self):
+        group = self.env["res.groups"].create({"name": "testgroup1"})
+        stats = self.rule_model.get_rule_index_stats()
+        self.assertGreaterEqual(stats["models"], 1)
+        group.write({"comment": "indexed"})
+        new_stats = self.rule_model.get_rule_index_stats()
+        self.assertEqual(new_stats["misses"], stats["misses"])
+        self.assertEqual(new_stats["hits"], stats["hits"] + 1)
+        log = self.auditlog_log.search(
+            [
+                ("model_id", "=", self.groups_model_id),
+                ("method", "=", "write"),
+                ("res_id", "=", group.id),
+            ]
+        ).ensure_one()
+        self.assertEqual(log.model_model, "res.groups")
+        self.assertEqual(log.line_ids.field_name, "comment")
+        self.assertTrue(log.line_ids.field_description)
+
+    def test_02_index_invalidated_on_rule_write(self):
+        group = self.env["res.groups"].create({"name": "testgroup2"})
+        comment_field = self.env["ir.model.fields"]._get("res.groups", "comment")
+        self.groups_rule.fields_to_exclude_ids = [(4, comment_field.id)]
+        stats = self.rule_model.get_rule_index_stats()
+        group.write({"comment": "excluded"})
+        self.assertEqual(
+            self.rule_model.get_rule_index_stats()["misses"], stats["misses"] + 1
+        )
+        self.assertFalse(
+            self.auditlog_log.search(
+                [
+                    ("model_id", "=", self.groups_model_id),
+                    ("method", "=", "write"),
+                    ("res_id", "=", group.id),
+                ]
+            )
+        )
+
+    def test_03_registry_reload_only_for_patched_methods(self):
+        self.env.registry.registry_invalidated = False
+        self.groups_rule.name = "renamed rule"
+        self.assertFalse(self.env.registry.registry_invalidated)
+        # Same value: the patched methods do not change
+        self.groups_rule.log_create = True
+        self.assertFalse(self.env.registry.registry_invalidated)
+        # Settings read from the rule index only invalidate it
+        self.groups_rule.log_type = "fast"
+        self.assertFalse(self.env.registry.registry_invalidated)
+        self.assertEqual(self.rule_model.get_rule_index_stats()["models"], 0)
+
+
+class TestAuditlogX2manyQueries(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partner_model_id = cls.env.ref("base.model_res_partner").id
+        cls.partner_rule = cls.env["auditlog.rule"].create(
+            {
+                "name": "testrule for partner tags",
+                "model_id": cls.partner_model_id,
+                "log_read": False,
+                "log_create": False,
+                "log_write": True,
+                "log_unlink": False,
+                "log_type": "full",
+            }
+        )
+        cls.categories = cls.env["res.partner.category"].create(
+            [{"name": f"testtag{i}"} for i in range(5)]
+        )
+
+    def _count_write_queries(self, size):
+        partners = (
+            self.env["res.partner"]
+            .with_context(tracking_disable=True)
+            .create(
+                [
+                    {
+                        "name": f"testpartner{i}",
+                        "category_id": [Command.set(self.categories[:2].ids)],
+                    }
+                    for i in range(size)
+                ]
+            )
+        )
+        self.env.flush_all()
+        self.env.invalidate_all()
+        nb_queries = self.env.cr.sql_log_count
+        partners.with_context(tracking_disable=True).write(
+            {"category_id": [Command.set(self.categories[2:].ids)]}
+        )
+        self.env.flush_all()
+        return partners, self.env.cr.sql_log_count - nb_queries
+
+    def test_01_bulk_x2many_write_queries(self):
+        """The queries issued to log a bulk x2many write do not depend on the
+        number of records written."""
+        self._count_write_queries(3)
+        plain_queries = [self._count_write_queries(size)[1] for size in (3, 30)]
+        self.partner_rule.subscribe()
+        self._count_write_queries(3)
+        queries_3 = self._count_write_queries(3)[1]
+        partners, queries_30 = self._count_write_queries(30)
+        self.assertEqual(queries_30 - plain_queries[1], queries_3 - plain_queries[0])
+        logs = self.env["auditlog.log"].search(
+            [
+                ("model_id", "=", self.partner_model_id),
+                ("method", "=", "write"),
+                ("res_id", "in", partners.ids),
+            ]
+        )
+        self.assertEqual(len(logs), 30)
+        line = logs[0].line_ids.filtered(
+            lambda log_line: log_line.field_name == "category_id"
+        )
+        for category in self.categories:
+            self.assertIn(category.name, line.new_value_text + line.old_value_text)
+
+
+class TestAuditlogHTTPCache(TransactionCase):
+    def test_01_existing_cached_id(self):
+        session_model = self.env["auditlog.http.session"]
+        session = session_model.create({"name": "test_sid", "user_id": self.env.uid})
+        self.assertEqual(existing_cached_id(session_model, session.id), session.id)
+        # Rolled back or vacuumed in the meantime
+        self.env.cr.execute(
+            "DELETE FROM auditlog_http_session WHERE id = %s", (session.id,)
+        )
+        self.env.invalidate_all()
+        self.assertFalse(existing_cached_id(session_model, session.id))
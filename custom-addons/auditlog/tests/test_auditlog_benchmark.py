@@ -0,0 +1,76 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import logging
+import time
+
+from odoo.tests.common import TransactionCase, tagged
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged("-standard", "auditlog_benchmark")
+class TestAuditlogBenchmark(TransactionCase):
+    """Compare the immediate and the deferred log writers.
+
+    Not part of the standard test run, launch it with
+    ``--test-tags auditlog_benchmark``.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partner_model_id = cls.env.ref("base.model_res_partner").id
+        cls.partner_rule = cls.env["auditlog.rule"].create(
+            {
+                "name": "benchmark rule for partners",
+                "model_id": cls.partner_model_id,
+                "log_read": False,
+                "log_create": False,
+                "log_write": True,
+                "log_unlink": False,
+                "log_type": "full",
+            }
+        )
+        cls.partner_rule.subscribe()
+
+    def _benchmark_writes(self, size, deferred_write):
+        self.partner_rule.deferred_write = deferred_write
+        partners = (
+            self.env["res.partner"]
+            .with_context(tracking_disable=True)
+            .create([{"name": f"benchmark partner {i}"} for i in range(size)])
+        )
+        self.env.cr.flush()
+        nb_queries = self.env.cr.sql_log_count
+        start = time.perf_counter()
+        for partner in partners:
+            partner.write({"ref": f"REF{partner.id}"})
+        self.env.cr.flush()
+        elapsed = time.perf_counter() - start
+        nb_queries = self.env.cr.sql_log_count - nb_queries
+        nb_logs = self.env["auditlog.log"].search_count(
+            [
+                ("model_id", "=", self.partner_model_id),
+                ("method", "=", "write"),
+                ("res_id", "in", partners.ids),
+            ]
+        )
+        self.assertEqual(nb_logs, size)
+        _logger.info(
+            "AUDITLOG BENCHMARK - %s writes, %s writer: %.2fs, %s queries",
+            size,
+            "deferred" if deferred_write else "immediate",
+            elapsed,
+            nb_queries,
+        )
+
+    def test_benchmark_1k_immediate(self):
+        self._benchmark_writes(1000, deferred_write=False)
+
+    def test_benchmark_1k_deferred(self):
+        self._benchmark_writes(1000, deferred_write=True)
+
+    def test_benchmark_10k_immediate(self):
+        self._benchmark_writes(10000, deferred_write=False)
+
+    def test_benchmark_10k_deferred(self):
+        self._benchmark_writes(10000, deferred_write=True)
@@ -1,5 +1,6 @@
 # Copyright 2016 ABF OSIELL <https://osiell.com>
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import json
 import time
 
 from odoo.tests.common import TransactionCase
@@ -42,3 +43,72 @@ class TestAuditlogAutovacuum(TransactionCase):
             [("model_id", "=", self.groups_model_id), ("res_id", "=", group.id)]
         )
         self.assertEqual(nb_logs, 0)
+
+    def test_autovacuum_batch(self):
+        log_model = self.env["auditlog.log"]
+        autovacuum_model = self.env["auditlog.autovacuum"]
+        groups = self.env["res.groups"].create(
+            [{"name": "testgroup1"}, {"name": "testgroup2"}, {"name": "testgroup3"}]
+        )
+        groups.write({"comment": "vacuum"})
+        domain = [("model_id", "=", self.groups_model_id), ("res_id", "in", groups.ids)]
+        logs = log_model.search(domain)
+        self.assertGreater(len(logs), 0)
+        lines = logs.line_ids
+        self.assertGreater(len(lines), 0)
+        time.sleep(1)
+        autovacuum_model.autovacuum_batch(days=0, batch_size=2)
+        self.assertEqual(log_model.search_count(domain), 0)
+        self.assertFalse(lines.exists())
+        # All the tables have been emptied, the next run starts over
+        checkpoints = self.env["ir.config_parameter"].get_param(
+            "auditlog.autovacuum_batch_checkpoints"
+        )
+        self.assertFalse(any(json.loads(checkpoints or "{}").values()))
+
+    def test_archive_logs(self):
+        log_model = self.env["auditlog.log"]
+        line_view_model = self.env["auditlog.log.line.view"]
+        autovacuum_model = self.env["auditlog.autovacuum"]
+        group = self.env["res.groups"].create({"name": "testgroup1"})
+        domain = [("model_id", "=", self.groups_model_id), ("res_id", "=", group.id)]
+        nb_lines = len(log_model.search(domain).line_ids)
+        self.assertGreater(nb_lines, 0)
+        self.assertEqual(line_view_model.search_count(domain), nb_lines)
+        time.sleep(1)
+        autovacuum_model.archive_logs(days=0, batch_size=1)
+        self.assertEqual(log_model.search_count(domain), 0)
+        # Archived lines are still listed
+        lines = line_view_model.search(domain)
+        self.assertEqual(len(lines), nb_lines)
+        self.assertEqual(set(lines.mapped("name")), {"testgroup1"})
+        self.assertFalse(lines.log_id)
+        # And so are the archived logs, with their lines
+        logs = self.env["auditlog.log.view"].search(domain)
+        self.assertTrue(logs)
+        self.assertTrue(all(logs.mapped("archived")))
+        self.assertEqual(logs.line_ids, lines)
+        # The partition of the current month is kept
+        autovacuum_model.drop_archived_logs(months=0)
+        self.assertEqual(line_view_model.search_count(domain), nb_lines)
+
+    def test_archive_logs_null_create_date(self):
+        log_model = self.env["auditlog.log"]
+        line_view_model = self.env["auditlog.log.line.view"]
+        group = self.env["res.groups"].create({"name": "testgroup1"})
+        domain = [("model_id", "=", self.groups_model_id), ("res_id", "=", group.id)]
+        logs = log_model.search(domain)
+        nb_lines = len(logs.line_ids)
+        self.assertGreater(nb_lines, 0)
+        self.env.flush_all()
+        self.env.cr.execute(
+            "UPDATE auditlog_log_line SET create_date = NULL WHERE id IN %s",
+            (tuple(logs.line_ids.ids),),
+        )
+        time.sleep(1)
+        self.env["auditlog.autovacuum"].archive_logs(days=0)
+        self.assertEqual(log_model.search_count(domain), 0)
+        # Lines without a create_date are archived under the date of their log
+        lines = line_view_model.search(domain)
+        self.assertEqual(len(lines), nb_lines)
+        self.assertTrue(all(lines.mapped("create_date")))
@@ -13,6 +13,7 @@
     "data": [
         'security/res_groups.xml',
         'security/ir.model.access.csv',
+        'data/ir_cron.xml',
         'views/consol_coa.xml',
         'views/consol_company.xml',
         'views/consol_elimination.xml',
@@ -7,3 +7,6 @@ from . import consolidation_engine
 from . import consolidation_cashflow_map
 from . import consolidation_rule
 from . import consolidation_group
+from . import account_move
+from . import consolidation_balance_snapshot
+from . import consolidation_ic_pair
@@ -0,0 +1,59 @@
+# thinq_account_consolidation/models/account_move.py
+from odoo import models
+
+# Field move / journal item yang ikut menentukan saldo di snapshot dan pair intercompany
+CONSOLIDATION_MOVE_FIELDS = {'date', 'company_id', 'partner_id', 'line_ids'}
+CONSOLIDATION_LINE_FIELDS = {
+    'move_id', 'company_id', 'account_id', 'account_type', 'partner_id', 'date',
+    'debit', 'credit', 'balance', 'amount_currency',
+}
+
+
+class AccountMove(models.Model):
+    _inherit = 'account.move'
+
+    def _consolidation_apply_delta(self, sign):
+        """Update tabel yang dijaga incremental: snapshot saldo bulanan & pair intercompany."""
+        self.env['consolidation.balance.snapshot'].sudo()._apply_move_delta(self, sign)
+        self.env['consolidation.ic.pair'].sudo()._apply_move_delta(self, sign)
+
+    def _consolidation_write(self, records, vals, write):
+        """Keluarkan saldo lama move posted, jalankan write, lalu masukkan saldo barunya.
+        Write bersarang (sync line dari move dan sebaliknya) tidak dihitung ulang."""
+        posted = self.filtered(lambda m: m.state == 'posted')
+        if not posted:
+            return write(records, vals)
+        posted._consolidation_apply_delta(-1)
+        res = write(records.with_context(consolidation_delta_applied=True), vals)
+        posted._consolidation_apply_delta(1)
+        return res
+
+    def write(self, vals):
+        if self.env.context.get('consolidation_delta_applied') or not CONSOLIDATION_MOVE_FIELDS & set(vals):
+            return super().write(vals)
+        return self._consolidation_write(self, vals, lambda records, vals: super(AccountMove, records).write(vals))
+
+    def _post(self, soft=True):
+        # Hanya move yang benar-benar berubah jadi posted yang ditambahkan
+        already_posted = self.filtered(lambda m: m.state == 'posted')
+        posted = super()._post(soft=soft)
+        (posted - already_posted)._consolidation_apply_delta(1)
+        return posted
+
+    def button_draft(self):
+        # button_cancel memanggil button_draft untuk move posted, jadi cukup di sini
+        self.filtered(lambda m: m.state == 'posted')._consolidation_apply_delta(-1)
+        return super().button_draft()
+
+
+class AccountMoveLine(models.Model):
+    _inherit = 'account.move.line'
+
+    def write(self, vals):
+        # Edit journal item di move posted (ganti akun, partner, nominal, ...) ikut mengubah snapshot & pair
+        if self.env.context.get('consolidation_delta_applied') or not CONSOLIDATION_LINE_FIELDS & set(vals):
+            return super().write(vals)
+        moves = self.move_id
+        if vals.get('move_id'):
+            moves |= moves.browse(vals['move_id'])
+        return moves._consolidation_write(self, vals, lambda records, vals: super(AccountMoveLine, records).write(vals))
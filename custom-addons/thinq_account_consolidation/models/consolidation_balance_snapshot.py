@@ -0,0 +1,152 @@
+# thinq_account_consolidation/models/consolidation_balance_snapshot.py
+import logging
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+
+class ConsolidationBalanceSnapshot(models.Model):
+    """
+    Saldo per (sumber, company, account, bulan). Dijaga incremental saat move di-post /
+    di-reset, saat journal item move posted diedit dan saat Eliminating Entry berubah
+    state, supaya engine cukup menjumlahkan bucket bulanan + bulan tepi (parsial) tanpa
+    scan GL ulang. Cron harian _cron_repair membetulkan selisih dari jalur lain (SQL, dll).
+    """
+    _name = 'consolidation.balance.snapshot'
+    _description = 'Consolidation Monthly Balance Snapshot'
+    _order = 'period desc, company_id, account_id'
+
+    source = fields.Selection([
+        ('gl', 'Journal Items'),
+        ('ee', 'Eliminating Entries'),
+    ], required=True, readonly=True, index=True)
+    company_id = fields.Many2one('res.company', required=True, readonly=True, ondelete='cascade')
+    account_id = fields.Many2one('account.account', required=True, readonly=True, ondelete='cascade')
+    period = fields.Date(required=True, readonly=True, index=True, help="Tanggal 1 dari bulan bucket.")
+    debit = fields.Monetary(readonly=True)
+    credit = fields.Monetary(readonly=True)
+    balance = fields.Monetary(readonly=True)
+    currency_id = fields.Many2one('res.currency', related='company_id.currency_id')
+
+    _sql_constraints = [
+        ('unique_bucket', 'unique(source, company_id, account_id, period)',
+         'Only one snapshot per source, company, account and month.')
+    ]
+
+    def init(self):
+        # Isi awal saat install / upgrade kalau tabel masih kosong
+        self.env.cr.execute(SQL("SELECT 1 FROM %s LIMIT 1", SQL.identifier(self._table)))
+        if not self.env.cr.rowcount:
+            self.rebuild()
+
+    # --------------------------
+    # ========= SOURCES ========
+    # --------------------------
+    def _gl_lines_query(self, move_ids=None):
+        """Line GL posted (opsional dibatasi id move), kolom: company_id, account_id, date, debit, credit."""
+        where = SQL("aml.parent_state = 'posted'")
+        if move_ids is not None:
+            where = SQL("%s AND aml.move_id IN %s", where, tuple(move_ids))
+        return SQL("""
+            SELECT aml.company_id, aml.account_id, aml.date, aml.debit, aml.credit
+              FROM account_move_line aml
+             WHERE %s
+        """, where)
+
+    def _ee_lines_query(self, line_ids=None):
+        """Line EE dari entry posted (opsional dibatasi id line)."""
+        where = SQL("e.state = 'posted'")
+        if line_ids is not None:
+            where = SQL("%s AND l.id IN %s", where, tuple(line_ids))
+        return SQL("""
+            SELECT e.company_id, l.account_id, e.date, l.debit, l.credit
+              FROM consolidation_elimination_line l
+              JOIN consolidation_elimination_entry e ON e.id = l.entry_id
+             WHERE %s
+        """, where)
+
+    def _bucket_select(self, source, lines_query, sign=1):
+        return SQL("""
+            SELECT %(source)s, src.company_id, src.account_id,
+                   date_trunc('month', src.date)::date,
+                   %(sign)s * SUM(COALESCE(src.debit, 0)),
+                   %(sign)s * SUM(COALESCE(src.credit, 0)),
+                   %(sign)s * SUM(COALESCE(src.debit, 0) - COALESCE(src.credit, 0))
+              FROM (%(lines)s) src
+             WHERE src.company_id IS NOT NULL AND src.account_id IS NOT NULL
+          GROUP BY src.company_id, src.account_id, date_trunc('month', src.date)
+        """, source=source, sign=sign, lines=lines_query)
+
+    # --------------------------
+    # ======== MAINTAIN ========
+    # --------------------------
+    @api.model
+    def rebuild(self):
+        """Hitung ulang semua snapshot dari GL dan EE."""
+        self.env.flush_all()
+        self.env.cr.execute(SQL("DELETE FROM %s", SQL.identifier(self._table)))
+        self._insert_buckets('gl', self._gl_lines_query())
+        if 'consolidation.elimination.line' in self.env:
+            self._insert_buckets('ee', self._ee_lines_query())
+        self.invalidate_model()
+        return True
+
+    @api.model
+    def _cron_repair(self):
+        """Bandingkan snapshot dengan hasil hitung ulang dari GL dan EE, rebuild kalau berbeda."""
+        self.env.flush_all()
+        expected = self._bucket_select('gl', self._gl_lines_query())
+        if 'consolidation.elimination.line' in self.env:
+            expected = SQL("%s UNION ALL %s", expected, self._bucket_select('ee', self._ee_lines_query()))
+        # Bucket bernilai nol (sisa delta move yang di-reset) dianggap tidak ada
+        self.env.cr.execute(SQL("""
+            WITH expected AS (
+                SELECT * FROM (%(expected)s) b(source, company_id, account_id, period, debit, credit, balance)
+                 WHERE debit != 0 OR credit != 0 OR balance != 0
+            ), actual AS (
+                SELECT source, company_id, account_id, period, debit, credit, balance
+                  FROM %(table)s
+                 WHERE debit != 0 OR credit != 0 OR balance != 0
+            )
+            SELECT COUNT(*) FROM (
+                (SELECT * FROM expected EXCEPT SELECT * FROM actual)
+                UNION ALL
+                (SELECT * FROM actual EXCEPT SELECT * FROM expected)
+            ) diff
+        """, expected=expected, table=SQL.identifier(self._table)))
+        drift = self.env.cr.fetchone()[0]
+        if drift:
+            _logger.warning("Consolidation: %s balance snapshot buckets out of sync, rebuilding", drift)
+            self.rebuild()
+        return True
+
+    def _insert_buckets(self, source, lines_query, sign=1):
+        self.env.cr.execute(SQL("""
+            INSERT INTO %(table)s (source, company_id, account_id, period, debit, credit, balance)
+            %(select)s
+            ON CONFLICT (source, company_id, account_id, period) DO UPDATE
+               SET debit = %(table)s.debit + EXCLUDED.debit,
+                   credit = %(table)s.credit + EXCLUDED.credit,
+                   balance = %(table)s.balance + EXCLUDED.balance
+        """, table=SQL.identifier(self._table), select=self._bucket_select(source, lines_query, sign)))
+
+    @api.model
+    def _apply_move_delta(self, moves, sign):
+        """Tambah (sign=1) / kurangi (sign=-1) saldo move posted ke bucket bulanannya."""
+        if not moves:
+            return
+        self.env['account.move.line'].flush_model(['move_id', 'parent_state', 'company_id', 'account_id', 'date', 'debit', 'credit'])
+        self._insert_buckets('gl', self._gl_lines_query(moves.ids), sign)
+        self.invalidate_model()
+
+    @api.model
+    def _apply_elimination_delta(self, lines, sign):
+        """Sama seperti _apply_move_delta untuk line Eliminating Entry (hanya entry posted)."""
+        if not lines:
+            return
+        self.env['consolidation.elimination.entry'].flush_model(['state', 'date', 'company_id'])
+        self.env['consolidation.elimination.line'].flush_model(['entry_id', 'account_id', 'debit', 'credit'])
+        self._insert_buckets('ee', self._ee_lines_query(lines.ids), sign)
+        self.invalidate_model()
@@ -14,6 +14,20 @@ class ConsolidationEliminationEntry(models.Model):
 
     source_move_line_ids = fields.Many2many('account.move.line', string='Source Move Lines', readonly=True)
 
+    def write(self, vals):
+        # Snapshot bulanan: keluarkan saldo lama, masukkan saldo baru setelah state/tanggal/company berubah
+        if not {'state', 'date', 'company_id'} & set(vals):
+            return super().write(vals)
+        Snapshot = self.env['consolidation.balance.snapshot'].sudo()
+        Snapshot._apply_elimination_delta(self.line_ids, -1)
+        res = super().write(vals)
+        Snapshot._apply_elimination_delta(self.line_ids, 1)
+        return res
+
+    def unlink(self):
+        self.env['consolidation.balance.snapshot'].sudo()._apply_elimination_delta(self.line_ids, -1)
+        return super().unlink()
+
     def action_post(self):
         for r in self:
             r.state = 'posted'
@@ -43,6 +57,25 @@ class ConsolidationEliminationLine(models.Model):
     balance    = fields.Monetary(compute='_compute_balance', store=True)
     currency_id = fields.Many2one('res.currency', related='company_id.currency_id', store=True, readonly=True)
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super().create(vals_list)
+        self.env['consolidation.balance.snapshot'].sudo()._apply_elimination_delta(lines, 1)
+        return lines
+
+    def write(self, vals):
+        if not {'entry_id', 'account_id', 'debit', 'credit'} & set(vals):
+            return super().write(vals)
+        Snapshot = self.env['consolidation.balance.snapshot'].sudo()
+        Snapshot._apply_elimination_delta(self, -1)
+        res = super().write(vals)
+        Snapshot._apply_elimination_delta(self, 1)
+        return res
+
+    def unlink(self):
+        self.env['consolidation.balance.snapshot'].sudo()._apply_elimination_delta(self, -1)
+        return super().unlink()
+
     @api.depends('debit','credit')
     def _compute_balance(self):
         for r in self:
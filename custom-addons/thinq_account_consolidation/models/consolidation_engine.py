@@ -1,7 +1,14 @@
 # thinq_account_consolidation/models/consolidation_engine.py
 from odoo import api, fields, models, _
+from odoo.tools import SQL, date_utils
 from collections import defaultdict
-from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+import logging
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
 
 class ConsolidationEngine(models.AbstractModel):
     _name = 'consolidation.engine'
@@ -60,12 +67,181 @@ class ConsolidationEngine(models.AbstractModel):
             bucket[key]['balance'] += float(l.get('balance', 0.0))
         return bucket
 
+    @api.model
+    def _group_by_company_account(self, model, domain):
+        """
+        Agregasi debit, credit, balance di database (satu baris per company & account),
+        hasilnya sama dengan _bucket_by_company_account tanpa menarik semua line ke Python.
+        return: {(company_id, account_id): {'debit':..,'credit':..,'balance':..}}
+        """
+        bucket = defaultdict(lambda: {'debit': 0.0, 'credit': 0.0, 'balance': 0.0})
+        groups = self.env[model].sudo()._read_group(
+            domain,
+            groupby=['company_id', 'account_id'],
+            aggregates=['debit:sum', 'credit:sum', 'balance:sum'],
+        )
+        for company, account, debit, credit, balance in groups:
+            if not company or not account:
+                continue
+            bucket[(company.id, account.id)] = {
+                'debit'  : debit or 0.0,
+                'credit' : credit or 0.0,
+                'balance': balance or 0.0,
+            }
+        return bucket
+
+    @api.model
+    def _snapshot_full_months(self, date_from, date_to):
+        """
+        Rentang bulan penuh di dalam periode: (awal bulan pertama, akhir bulan terakhir).
+        False = tidak dibatasi. Return None kalau periode tidak memuat satu bulan penuh pun.
+        """
+        date_from = fields.Date.to_date(date_from)
+        date_to = fields.Date.to_date(date_to)
+        full_from = date_from and date_utils.start_of(date_from, 'month')
+        if date_from and full_from < date_from:
+            full_from = date_utils.end_of(date_from, 'month') + timedelta(days=1)
+        full_to = date_to and date_utils.end_of(date_to, 'month')
+        if date_to and full_to > date_to:
+            full_to = date_utils.start_of(date_to, 'month') - timedelta(days=1)
+        if full_from and full_to and full_from > full_to:
+            return None
+        return full_from, full_to
+
+    @api.model
+    def _group_with_snapshot(self, source, model, domain_func, companies, date_from, date_to):
+        """
+        Bulan penuh diambil dari consolidation.balance.snapshot, bulan tepi (parsial)
+        dihitung langsung dari model sumber. Hasil sama dengan _group_by_company_account.
+        """
+        full_months = self._snapshot_full_months(date_from, date_to)
+        if not full_months:
+            return self._group_by_company_account(model, domain_func(companies, date_from, date_to))
+        full_from, full_to = full_months
+
+        snapshot_domain = [('source', '=', source)]
+        if companies:
+            snapshot_domain.append(('company_id', 'in', companies.ids))
+        if full_from:
+            snapshot_domain.append(('period', '>=', full_from))
+        if full_to:
+            snapshot_domain.append(('period', '<=', full_to))
+        bucket = self._group_by_company_account('consolidation.balance.snapshot', snapshot_domain)
+
+        edges = []
+        if full_from and fields.Date.to_date(date_from) < full_from:
+            edges.append((date_from, full_from - timedelta(days=1)))
+        if full_to and fields.Date.to_date(date_to) > full_to:
+            edges.append((full_to + timedelta(days=1), date_to))
+        for edge_from, edge_to in edges:
+            edge_bucket = self._group_by_company_account(model, domain_func(companies, edge_from, edge_to))
+            for key, vals in edge_bucket.items():
+                bucket[key]['debit']   += vals['debit']
+                bucket[key]['credit']  += vals['credit']
+                bucket[key]['balance'] += vals['balance']
+        return bucket
+
+    @api.model
+    def _group_posted_move_lines(self, companies, date_from, date_to):
+        """
+        Saldo account.move.line posted dalam periode, di-group per company & account.
+        """
+        return self._group_with_snapshot(
+            'gl', 'account.move.line', self._domain_base_period, companies, date_from, date_to)
+
     @api.model
     def _company_account_maps(self, comp_ids, acc_ids):
         companies_map = {c.id: c for c in self.env['res.company'].browse(list(comp_ids))}
         accounts_map  = {a.id: a for a in self.env['account.account'].browse(list(acc_ids))}
         return companies_map, accounts_map
 
+    @api.model
+    def _merge_bucket(self, bucket, other):
+        for key, vals in other.items():
+            bucket[key]['debit']   += vals['debit']
+            bucket[key]['credit']  += vals['credit']
+            bucket[key]['balance'] += vals['balance']
+        return bucket
+
+    # --------------------------
+    # ==== PARALLEL COMPUTE ====
+    # --------------------------
+    @api.model
+    def _parallel_workers(self):
+        """
+        Jumlah worker thread untuk hitung per entitas (0 = sequential, satu query untuk semua).
+        Split: 'company' atau 'company_month' (per entitas per bulan).
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        workers = int(ICP.get_param('thinq_account_consolidation.parallel_workers', 0) or 0)
+        split = ICP.get_param('thinq_account_consolidation.parallel_split', 'company')
+        return workers, split
+
+    @api.model
+    def _group_company_matrix(self, companies, date_from, date_to, include_elimination=True):
+        """
+        Bucket GL (+ EE) per company & account untuk semua companies.
+        Paralel per entitas bila parallel_workers > 0 (tidak saat test, cursor test tidak bisa dibagi).
+        """
+        workers, split = self._parallel_workers()
+        if workers > 0 and len(companies) > 1 and not getattr(threading.current_thread(), 'testing', False):
+            return self._group_company_matrix_parallel(companies, date_from, date_to, include_elimination, workers, split)
+        bucket = self._group_posted_move_lines(companies, date_from, date_to)
+        if include_elimination:
+            self._merge_bucket(bucket, self._group_elimination_lines(companies, date_from, date_to))
+        return bucket
+
+    @api.model
+    def _parallel_tasks(self, companies, date_from, date_to, split):
+        periods = [(date_from, date_to)]
+        if split == 'company_month' and date_from and date_to:
+            periods = []
+            start, end = fields.Date.to_date(date_from), fields.Date.to_date(date_to)
+            while start <= end:
+                month_end = min(date_utils.end_of(start, 'month'), end)
+                periods.append((start, month_end))
+                start = month_end + timedelta(days=1)
+        return [(company.id, p_from, p_to) for company in companies for p_from, p_to in periods]
+
+    @api.model
+    def _group_company_matrix_parallel(self, companies, date_from, date_to, include_elimination, workers, split):
+        bucket = defaultdict(lambda: {'debit': 0.0, 'credit': 0.0, 'balance': 0.0})
+        timings = defaultdict(float)
+        start = time.perf_counter()
+        tasks = self._parallel_tasks(companies, date_from, date_to, split)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='consolidation') as executor:
+            futures = [executor.submit(self._compute_entity_bucket, *task, include_elimination) for task in tasks]
+            for future in futures:
+                company_id, elapsed, part = future.result()
+                timings[company_id] += elapsed
+                self._merge_bucket(bucket, part)
+        self._log_entity_timings(timings, time.perf_counter() - start)
+        return bucket
+
+    def _compute_entity_bucket(self, company_id, date_from, date_to, include_elimination):
+        """Jalan di worker thread: cursor sendiri, hasil berupa dict biasa."""
+        start = time.perf_counter()
+        with self.pool.cursor(readonly=True) as cr:
+            env = api.Environment(cr, self.env.uid, self.env.context)
+            engine = env['consolidation.engine']
+            company = env['res.company'].browse(company_id)
+            bucket = engine._group_posted_move_lines(company, date_from, date_to)
+            if include_elimination:
+                engine._merge_bucket(bucket, engine._group_elimination_lines(company, date_from, date_to))
+            part = {key: dict(vals) for key, vals in bucket.items()}
+        return company_id, time.perf_counter() - start, part
+
+    @api.model
+    def _log_entity_timings(self, timings, wall_time):
+        """Log kontribusi waktu per entitas (terlama di atas) untuk cari subsidiary yang lambat."""
+        total = sum(timings.values()) or 1.0
+        names = {c.id: c.display_name for c in self.env['res.company'].browse(list(timings))}
+        _logger.info("Consolidation: %s entities computed in %.3fs wall time (%.3fs worker time)",
+                     len(timings), wall_time, total)
+        for company_id, elapsed in sorted(timings.items(), key=lambda item: item[1], reverse=True):
+            _logger.info("Consolidation:   %-40s %8.3fs %5.1f%%",
+                         names.get(company_id, company_id), elapsed, 100.0 * elapsed / total)
+
     # --------------------------
     # ====== CORE COMPUTE ======
     # --------------------------
@@ -76,16 +252,7 @@ class ConsolidationEngine(models.AbstractModel):
         """
         companies = self._get_descendants(root_company, at_date=date_to, include_self=True)
 
-        aml = self._pull_posted_move_lines(companies, date_from, date_to)
-        bucket = self._bucket_by_company_account(aml)
-
-        if include_elimination:
-            ee = self._pull_elimination_lines(companies, date_from, date_to)
-            ee_bucket = self._bucket_by_company_account(ee)
-            for key, vals in ee_bucket.items():
-                bucket[key]['debit']   += vals['debit']
-                bucket[key]['credit']  += vals['credit']
-                bucket[key]['balance'] += vals['balance']
+        bucket = self._group_company_matrix(companies, date_from, date_to, include_elimination=include_elimination)
 
         comp_ids = {k[0] for k in bucket.keys()}
         acc_ids  = {k[1] for k in bucket.keys()}
@@ -227,37 +394,44 @@ class ConsolidationEngine(models.AbstractModel):
             base = bal
         return base
 
+    @api.model
+    def _cashflow_resolution_table(self, accounts):
+        """
+        Preload mapping Cash Flow sekali per laporan: {account_id: (section, sign)}.
+        Prioritas: mapping akun, lalu mapping tag (id mapping terkecil), fallback OPERATING / 1.
+        """
+        table = {acc.id: ('OPERATING', 1) for acc in accounts}
+        if 'consolidation.cashflow.map' not in self.env:
+            return table
+        acc_maps, tag_maps = {}, {}
+        mappings = self.env['consolidation.cashflow.map'].sudo().search_read(
+            [], ['account_id', 'tag_id', 'section', 'sign'], order='id')
+        for m in mappings:
+            resolved = (m['section'], m['sign'] or 1)
+            if m['account_id']:
+                acc_maps.setdefault(m['account_id'][0], resolved)
+            if m['tag_id']:
+                tag_maps.setdefault(m['tag_id'][0], (m['id'], resolved))
+        for acc in accounts:
+            if acc.id in acc_maps:
+                table[acc.id] = acc_maps[acc.id]
+                continue
+            tag_hits = [tag_maps[t] for t in acc.tag_ids.ids if t in tag_maps]
+            if tag_hits:
+                table[acc.id] = min(tag_hits)[1]
+        return table
+
     @api.model
     def compute_cash_flow(self, root_company, date_from, date_to):
         rows = self.compute_raw_matrix(root_company, date_from, date_to, include_elimination=True)
-        # siapkan peta akun utk cari mapping CF
-        acc_ids = list({r['account_id'] for r in rows})
-        acc_map = {a.id: a for a in self.env['account.account'].browse(acc_ids)}
+        # resolusi section & sign CF untuk semua akun sekaligus, loop di bawah tanpa query
+        accounts = self.env['account.account'].browse(list({r['account_id'] for r in rows}))
+        cf_table = self._cashflow_resolution_table(accounts)
 
         out = []
-        # optional mapping sign
-        sign_map = {}
-        if 'consolidation.cashflow.map' in self.env:
-            for m in self.env['consolidation.cashflow.map'].sudo().search([]):
-                key = ('acc', m.account_id.id) if m.account_id else ('tag', m.tag_id.id)
-                sign_map[key] = m.sign if m.sign else 1
-
         for r in rows:
-            acc = acc_map.get(r['account_id'])
-            section = self._get_cf_section_by_mapping(acc)  # OPERATING / INVESTING / FINANCING
-            amount  = self._normalize_amount_cf(r)
-
-            # apply sign config bila ada
-            sig = 1
-            if acc:
-                if ('acc', acc.id) in sign_map:
-                    sig = sign_map[('acc', acc.id)]
-                else:
-                    tag_hit = next((sign_map[('tag', t.id)] for t in acc.tag_ids if ('tag', t.id) in sign_map), None)
-                    if tag_hit is not None:
-                        sig = tag_hit
-            amount *= sig
-
+            section, sig = cf_table.get(r['account_id'], ('OPERATING', 1))  # OPERATING / INVESTING / FINANCING
+            amount = self._normalize_amount_cf(r) * sig
             out.append({**r, 'statement': 'CF', 'section': section, 'amount': amount})
         return out
     
@@ -272,6 +446,17 @@ class ConsolidationEngine(models.AbstractModel):
         companies = self.env['res.company'].browse(company_ids)
         return {c.id: c.partner_id.id for c in companies if c.partner_id}
 
+    @api.model
+    def _domain_elimination_period(self, companies, date_from, date_to):
+        domain = [('entry_id.state', '=', 'posted')]
+        if companies:
+            domain.append(('company_id', 'in', companies.ids))
+        if date_from:
+            domain.append(('entry_id.date', '>=', date_from))
+        if date_to:
+            domain.append(('entry_id.date', '<=', date_to))
+        return domain
+
     @api.model
     def _pull_elimination_lines(self, companies, date_from, date_to):
         """
@@ -281,26 +466,104 @@ class ConsolidationEngine(models.AbstractModel):
         if model_name not in self.env:
             return []
         EL = self.env[model_name].sudo()
-        domain = [('entry_id.state', '=', 'posted')]
-        if companies:
-            domain.append(('company_id', 'in', companies.ids))
-        if date_from:
-            domain.append(('entry_id.date', '>=', date_from))
-        if date_to:
-            domain.append(('entry_id.date', '<=', date_to))
+        domain = self._domain_elimination_period(companies, date_from, date_to)
         fields_to_read = ['company_id', 'account_id', 'debit', 'credit', 'balance']
         return EL.search_read(domain, fields_to_read, limit=0)
 
+    @api.model
+    def _group_elimination_lines(self, companies, date_from, date_to):
+        """
+        Saldo Eliminating Entries 'posted' dalam periode, di-group per company & account.
+        """
+        model_name = 'consolidation.elimination.line'
+        if model_name not in self.env:
+            return {}
+        return self._group_with_snapshot(
+            'ee', model_name, self._domain_elimination_period, companies, date_from, date_to)
+
     # -------------------------------
     # 2.1 Generator: Intercompany AR/AP
     # -------------------------------
+    @api.model
+    def _group_intercompany_pairs(self, tree_ids, date_from, date_to):
+        """
+        Saldo AR/AP intercompany per (company sumber, company lawan) dalam periode.
+        Bulan penuh dari consolidation.ic.pair, bulan tepi langsung dari journal item.
+        return: {(src_company_id, dst_company_id): balance}
+        """
+        pair_sum = defaultdict(float)
+        full_months = self._snapshot_full_months(date_from, date_to)
+        edges = [(date_from, date_to)]
+        if full_months:
+            full_from, full_to = full_months
+            pairs = self.env['consolidation.ic.pair'].sudo()._read_group(
+                [('company_id', 'in', tree_ids),
+                 ('counterpart_company_id', 'in', tree_ids),
+                 ('period', '>=', full_from),
+                 ('period', '<=', full_to)],
+                groupby=['company_id', 'counterpart_company_id'],
+                aggregates=['balance:sum'],
+            )
+            for company, counterpart, balance in pairs:
+                pair_sum[(company.id, counterpart.id)] += balance or 0.0
+            edges = []
+            if fields.Date.to_date(date_from) < full_from:
+                edges.append((date_from, full_from - timedelta(days=1)))
+            if fields.Date.to_date(date_to) > full_to:
+                edges.append((full_to + timedelta(days=1), date_to))
+
+        # build partner->company reverse map
+        partner2company = {p_id: c_id for c_id, p_id in self._company_partner_id_map(tree_ids).items()}
+        for edge_from, edge_to in edges:
+            groups = self.env['account.move.line'].sudo()._read_group(
+                [('date', '>=', edge_from),
+                 ('date', '<=', edge_to),
+                 ('company_id', 'in', tree_ids),
+                 ('parent_state', '=', 'posted'),
+                 ('account_type', 'in', ['asset_receivable', 'liability_payable']),
+                 ('partner_id', 'in', list(partner2company))],
+                groupby=['company_id', 'partner_id'],
+                aggregates=['balance:sum'],
+            )
+            for company, partner, balance in groups:
+                dst_cid = partner2company.get(partner.id)
+                if not dst_cid or dst_cid == company.id:
+                    continue
+                pair_sum[(company.id, dst_cid)] += balance or 0.0
+        return {key: amount for key, amount in pair_sum.items() if amount}
+
+    @api.model
+    def _link_intercompany_source_lines(self, entry, tree_ids, date_from, date_to):
+        """Isi source_move_line_ids langsung di database (tanpa membaca id ke Python)."""
+        field = entry._fields['source_move_line_ids']
+        IcPair = self.env['consolidation.ic.pair']
+        self.env['account.move.line'].flush_model()
+        self.env.cr.execute(SQL("""
+            INSERT INTO %(relation)s (%(column1)s, %(column2)s)
+            SELECT %(entry_id)s, src.id
+              FROM (%(lines)s) src
+             WHERE src.company_id IN %(tree_ids)s
+               AND src.counterpart_company_id IN %(tree_ids)s
+               AND src.date BETWEEN %(date_from)s AND %(date_to)s
+            ON CONFLICT DO NOTHING
+        """,
+            relation=SQL.identifier(field.relation),
+            column1=SQL.identifier(field.column1),
+            column2=SQL.identifier(field.column2),
+            entry_id=entry.id,
+            lines=IcPair._ic_lines_query(),
+            tree_ids=tuple(tree_ids),
+            date_from=date_from,
+            date_to=date_to,
+        ))
+        entry.invalidate_recordset(['source_move_line_ids'])
+
     @api.model
     def generate_eliminations(self, parent_company, date_from, date_to):
         """Generate satu Eliminating Entry (AR/AP intercompany) untuk periode."""
         Rule  = self.env['consolidation.elimination.rule'].sudo()
         Entry = self.env['consolidation.elimination.entry'].sudo()
         ELine = self.env['consolidation.elimination.line'].sudo()
-        AML   = self.env['account.move.line'].sudo()
 
         rule = Rule.search([
             ('parent_company_id', '=', parent_company.id),
@@ -314,37 +577,7 @@ class ConsolidationEngine(models.AbstractModel):
         if not tree_ids:
             return False
 
-        comp2partner = self._company_partner_id_map(tree_ids)
-
-        aml_domain = [
-            ('date', '>=', date_from),
-            ('date', '<=', date_to),
-            ('company_id', 'in', tree_ids),
-            ('parent_state', '=', 'posted'),
-            ('account_type', 'in', ['asset_receivable', 'liability_payable']),
-            ('balance', '!=', 0.0),
-            ('partner_id', '!=', False),
-        ]
-        fields_needed = ['company_id', 'partner_id', 'account_id', 'balance', 'currency_id', 'date']
-        lines = AML.with_context(prefetch_fields=False).search_read(aml_domain, fields=fields_needed, limit=0)
-        if not lines:
-            return False
-
-        # build partner->company reverse map
-        partner2company = {p_id: c_id for c_id, p_id in comp2partner.items()}
-
-        from collections import defaultdict as dd
-        pair_sum = dd(float)
-        source_line_ids = []
-        for l in lines:
-            src_cid = l['company_id'][0]
-            dst_cid = partner2company.get(l['partner_id'][0])
-            if not dst_cid or dst_cid == src_cid:
-                continue
-            pair_sum[(src_cid, dst_cid)] += float(l.get('balance', 0.0))
-            if 'id' in l:
-                source_line_ids.append(l['id'])
-
+        pair_sum = self._group_intercompany_pairs(tree_ids, date_from, date_to)
         if not pair_sum:
             return False
 
@@ -356,8 +589,7 @@ class ConsolidationEngine(models.AbstractModel):
             'rule_id': rule.id,
             'auto_generated': True,
         })
-        if source_line_ids:
-            entry.write({'source_move_line_ids': [(6, 0, source_line_ids)]})
+        self._link_intercompany_source_lines(entry, tree_ids, date_from, date_to)
 
         lines_to_create = []
         for (src_cid, dst_cid), amount in pair_sum.items():
@@ -403,17 +635,8 @@ class ConsolidationEngine(models.AbstractModel):
             tree_ids.append(parent_company.id)
 
         # 1) Ambil saldo JE (GL) per perusahaan, akun
-        AML = self.env['account.move.line']
-        gl_rows = AML.read_group(
-            domain=[
-                ('date', '>=', date_from), ('date', '<=', date_to),
-                ('parent_state', '=', 'posted'),
-                ('company_id', 'in', tree_ids),
-            ],
-            fields=['company_id', 'account_id', 'balance:sum'],
-            groupby=['company_id', 'account_id'],
-            lazy=False
-        )
+        companies = self.env['res.company'].browse(tree_ids)
+        gl_bucket = self._group_company_matrix(companies, date_from, date_to, include_elimination=False)
 
         # 2) Tambahkan EE (eliminating entries) periode — gunakan model kita
         EE = self.env['consolidation.elimination.entry']
@@ -428,11 +651,8 @@ class ConsolidationEngine(models.AbstractModel):
         from collections import defaultdict
         matrix = defaultdict(float)
 
-        for r in gl_rows:
-            if r.get('company_id') and r.get('account_id'):
-                c = r['company_id'][0]
-                a = r['account_id'][0]
-                matrix[(c, a)] += r.get('balance_sum', 0.0)
+        for (c, a), vals in gl_bucket.items():
+            matrix[(c, a)] += vals['balance']
 
         for l in ee_lines:
             c = l['company_id'][0]
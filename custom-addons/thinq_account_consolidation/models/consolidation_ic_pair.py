@@ -0,0 +1,119 @@
+# thinq_account_consolidation/models/consolidation_ic_pair.py
+import logging
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+IC_ACCOUNT_TYPES = ('asset_receivable', 'liability_payable')
+
+
+class ConsolidationIcPair(models.Model):
+    """
+    Saldo AR/AP intercompany per (company sumber, company lawan, tipe akun, bulan).
+    Lawan = company yang partner_id-nya dipakai di journal item. Dijaga incremental
+    saat move di-post / di-reset ke draft (cancel move posted juga lewat button_draft,
+    jadi dikurangi sekali) dan saat journal item move posted diedit, dipakai
+    generate_eliminations. Cron harian _cron_repair membetulkan selisih dari jalur lain.
+    """
+    _name = 'consolidation.ic.pair'
+    _description = 'Consolidation Intercompany AR/AP Pair Balance'
+    _order = 'period desc, company_id, counterpart_company_id'
+
+    company_id = fields.Many2one('res.company', required=True, readonly=True, ondelete='cascade')
+    counterpart_company_id = fields.Many2one('res.company', required=True, readonly=True, ondelete='cascade')
+    account_type = fields.Selection([
+        ('asset_receivable', 'Receivable'),
+        ('liability_payable', 'Payable'),
+    ], required=True, readonly=True)
+    period = fields.Date(required=True, readonly=True, index=True, help="Tanggal 1 dari bulan bucket.")
+    balance = fields.Monetary(readonly=True)
+    currency_id = fields.Many2one('res.currency', related='company_id.currency_id')
+
+    _sql_constraints = [
+        ('unique_pair', 'unique(company_id, counterpart_company_id, account_type, period)',
+         'Only one pair balance per companies, account type and month.')
+    ]
+
+    def init(self):
+        self.env.cr.execute(SQL("SELECT 1 FROM %s LIMIT 1", SQL.identifier(self._table)))
+        if not self.env.cr.rowcount:
+            self.rebuild()
+
+    @api.model
+    def _ic_lines_query(self, move_ids=None):
+        """Journal item AR/AP posted yang partner-nya adalah company lain."""
+        where = SQL(
+            "aml.parent_state = 'posted' AND aml.account_type IN %s AND aml.balance != 0",
+            IC_ACCOUNT_TYPES,
+        )
+        if move_ids is not None:
+            where = SQL("%s AND aml.move_id IN %s", where, tuple(move_ids))
+        return SQL("""
+            SELECT aml.id, aml.company_id, rc.id AS counterpart_company_id,
+                   aml.account_type, aml.date, aml.balance
+              FROM account_move_line aml
+              JOIN res_company rc ON rc.partner_id = aml.partner_id AND rc.id != aml.company_id
+             WHERE %s
+        """, where)
+
+    @api.model
+    def rebuild(self):
+        """Hitung ulang semua pair dari GL."""
+        self.env.flush_all()
+        self.env.cr.execute(SQL("DELETE FROM %s", SQL.identifier(self._table)))
+        self._insert_pairs(self._ic_lines_query())
+        self.invalidate_model()
+        return True
+
+    @api.model
+    def _cron_repair(self):
+        """Bandingkan pair dengan hasil hitung ulang dari GL, rebuild kalau berbeda."""
+        self.env.flush_all()
+        # Pair bersaldo nol (sisa delta move yang di-reset) dianggap tidak ada
+        self.env.cr.execute(SQL("""
+            WITH expected AS (
+                SELECT src.company_id, src.counterpart_company_id, src.account_type,
+                       date_trunc('month', src.date)::date AS period, SUM(src.balance) AS balance
+                  FROM (%(lines)s) src
+              GROUP BY src.company_id, src.counterpart_company_id, src.account_type,
+                       date_trunc('month', src.date)
+                HAVING SUM(src.balance) != 0
+            ), actual AS (
+                SELECT company_id, counterpart_company_id, account_type, period, balance
+                  FROM %(table)s
+                 WHERE balance != 0
+            )
+            SELECT COUNT(*) FROM (
+                (SELECT * FROM expected EXCEPT SELECT * FROM actual)
+                UNION ALL
+                (SELECT * FROM actual EXCEPT SELECT * FROM expected)
+            ) diff
+        """, lines=self._ic_lines_query(), table=SQL.identifier(self._table)))
+        drift = self.env.cr.fetchone()[0]
+        if drift:
+            _logger.warning("Consolidation: %s intercompany pair balances out of sync, rebuilding", drift)
+            self.rebuild()
+        return True
+
+    def _insert_pairs(self, lines_query, sign=1):
+        self.env.cr.execute(SQL("""
+            INSERT INTO %(table)s (company_id, counterpart_company_id, account_type, period, balance)
+            SELECT src.company_id, src.counterpart_company_id, src.account_type,
+                   date_trunc('month', src.date)::date, %(sign)s * SUM(src.balance)
+              FROM (%(lines)s) src
+          GROUP BY src.company_id, src.counterpart_company_id, src.account_type,
+                   date_trunc('month', src.date)
+            ON CONFLICT (company_id, counterpart_company_id, account_type, period) DO UPDATE
+               SET balance = %(table)s.balance + EXCLUDED.balance
+        """, table=SQL.identifier(self._table), sign=sign, lines=lines_query))
+
+    @api.model
+    def _apply_move_delta(self, moves, sign):
+        """Tambah (sign=1) / kurangi (sign=-1) saldo intercompany move posted."""
+        if not moves:
+            return
+        self.env['account.move.line'].flush_model(['move_id', 'parent_state', 'company_id', 'partner_id', 'account_type', 'date', 'balance'])
+        self._insert_pairs(self._ic_lines_query(moves.ids), sign)
+        self.invalidate_model()
@@ -1,5 +1,8 @@
 # models/res_company.py
-from odoo import api, fields, models, _
+from collections import defaultdict
+from datetime import date
+
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import ValidationError
 
 class ConsolidationLink(models.Model):
@@ -22,66 +25,105 @@ class ConsolidationLink(models.Model):
          'This parent/child link already exists for that period.')
     ]
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        links = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return links
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
     @api.constrains('parent_id', 'child_id', 'date_from', 'date_to')
     def _check_rules(self):
+        # satu query untuk seluruh batch, sisanya dicek di memory
+        rows = self._read_link_rows()
         for r in self:
             if r.parent_id == r.child_id:
                 raise ValidationError(_("Parent and child cannot be the same company."))
 
             # 1) Child company tidak boleh dipilih oleh parent lain pada periode yang overlap
-            overlap = self.search([
-                ('id', '!=', r.id),
-                ('child_id', '=', r.child_id.id),
-                ('active', '=', True),
-                ('date_from', '<=', r.date_to or fields.Date.max),
-                ('date_to', '>=', r.date_from)  # overlap
-            ], limit=1)
-            if overlap:
-                raise ValidationError(
-                    _("Company '%s' already belongs to another parent in the selected period.")
-                    % r.child_id.display_name
-                )
+            r_to = r.date_to or date.max
+            for link_id, parent_id, child_id, date_from, date_to in rows:
+                if link_id == r.id or child_id != r.child_id.id:
+                    continue
+                if date_from <= r_to and (date_to or date.max) >= r.date_from:
+                    raise ValidationError(
+                        _("Company '%s' already belongs to another parent in the selected period.")
+                        % r.child_id.display_name
+                    )
 
             # 2) Cegah siklus (A->B, B->A, dst)
-            # if r._creates_cycle():
-            #     raise ValidationError(_("This link would create a cycle in the hierarchy."))
+            if r._creates_cycle(rows):
+                raise ValidationError(_("This link would create a cycle in the hierarchy."))
 
-    def _creates_cycle(self):
-        """Simple DFS to ensure no cycles."""
+    def _creates_cycle(self, rows=None):
+        """DFS in-memory dari child ke bawah: siklus kalau sampai lagi ke parent."""
+        children = defaultdict(set)
+        for _link_id, parent_id, child_id, _date_from, _date_to in (rows if rows is not None else self._read_link_rows()):
+            children[parent_id].add(child_id)
+        children[self.parent_id.id].add(self.child_id.id)
         seen = set()
-        stack = [self.parent_id.id]
+        stack = [self.child_id.id]
         while stack:
-            parent = stack.pop()
-            if parent in seen:
+            node = stack.pop()
+            if node == self.parent_id.id:
+                return True
+            if node in seen:
                 continue
-            seen.add(parent)
-            childs = self.search_read([
-                ('parent_id', '=', parent),
-                ('active', '=', True)
-            ], ['child_id'])
-            for ch in childs:
-                cid = ch['child_id'][0]
-                if cid == self.child_id.id:
-                    return True
-                stack.append(cid)
+            seen.add(node)
+            stack.extend(children.get(node, ()))
         return False
 
+    # --------------------------
+    # ===== GRAPH (CACHED) =====
+    # --------------------------
+    @api.model
+    def _read_link_rows(self):
+        """Semua link aktif: [(id, parent_id, child_id, date_from, date_to)]."""
+        links = self.sudo().search_read([('active', '=', True)], ['parent_id', 'child_id', 'date_from', 'date_to'])
+        return [
+            (l['id'], l['parent_id'][0], l['child_id'][0], l['date_from'], l['date_to'])
+            for l in links
+        ]
+
+    @api.model
+    @tools.ormcache()
+    def _get_link_rows(self):
+        return tuple(self._read_link_rows())
+
+    @api.model
+    @tools.ormcache('on_date')
+    def _get_children_map(self, on_date):
+        """Graph parent -> children yang efektif pada tanggal tsb (di-cache per tanggal)."""
+        children = defaultdict(list)
+        for _link_id, parent_id, child_id, date_from, date_to in self._get_link_rows():
+            if date_from <= on_date and (not date_to or date_to >= on_date):
+                children[parent_id].append(child_id)
+        return {parent_id: tuple(child_ids) for parent_id, child_ids in children.items()}
+
     # Helper: ambil semua anak (rekursif) pada tanggal tertentu
     @api.model
     def descendants(self, root_company, on_date, include_self=True):
+        on_date = fields.Date.to_date(on_date) or fields.Date.context_today(self)
+        children = self._get_children_map(on_date)
         ids = set([root_company.id] if include_self else [])
+        seen = {root_company.id}
         frontier = [root_company.id]
         while frontier:
             pids = frontier
             frontier = []
-            links = self.search([
-                ('parent_id', 'in', pids),
-                ('active', '=', True),
-                ('date_from', '<=', on_date),
-                '|', ('date_to', '=', False), ('date_to', '>=', on_date),
-            ])
-            for l in links:
-                if l.child_id.id not in ids:
-                    ids.add(l.child_id.id)
-                    frontier.append(l.child_id.id)
+            for pid in pids:
+                for cid in children.get(pid, ()):
+                    if cid not in seen:
+                        seen.add(cid)
+                        ids.add(cid)
+                        frontier.append(cid)
         return self.env['res.company'].browse(list(ids))
@@ -0,0 +1,87 @@
+# thinq_account_consolidation/scripts/benchmark_raw_matrix.py
+"""
+Benchmark compute_raw_matrix: agregasi di database (_read_group) vs
+search_read + bucketing di Python (path lama).
+
+Jalankan lewat odoo shell, data seed di-rollback di akhir:
+
+    N=100000 odoo-bin shell -d <db> --no-http \
+        < thinq_account_consolidation/scripts/benchmark_raw_matrix.py
+
+Variabel `env` disediakan oleh odoo shell.
+"""
+import os
+import resource
+import time
+import tracemalloc
+
+from odoo import fields
+
+N = int(os.environ.get('N', 100000))
+LINES_PER_MOVE = 100
+
+company = env.company
+engine = env['consolidation.engine']
+Account = env['account.account']
+journal = env['account.journal'].search([
+    ('company_id', '=', company.id),
+    ('type', '=', 'general'),
+], limit=1)
+accounts = Account.search(Account._check_company_domain(company) + [
+    ('account_type', 'not in', ['asset_receivable', 'liability_payable', 'off_balance']),
+], limit=20)
+today = fields.Date.context_today(engine)
+
+
+def seed():
+    """Buat N move line posted (pasangan debit/credit) pada tanggal hari ini."""
+    nb_lines = 0
+    while nb_lines < N:
+        line_vals = []
+        for i in range(LINES_PER_MOVE // 2):
+            account = accounts[(nb_lines + i) % len(accounts)]
+            amount = float(i + 1)
+            line_vals += [
+                (0, 0, {'account_id': account.id, 'debit': amount, 'credit': 0.0, 'name': 'bench'}),
+                (0, 0, {'account_id': accounts[0].id, 'debit': 0.0, 'credit': amount, 'name': 'bench'}),
+            ]
+        move = env['account.move'].create({
+            'move_type': 'entry',
+            'journal_id': journal.id,
+            'date': today,
+            'line_ids': line_vals,
+        })
+        move.action_post()
+        nb_lines += len(line_vals)
+    env.flush_all()
+    return nb_lines
+
+
+def measure(label, func):
+    env.invalidate_all()
+    tracemalloc.start()
+    start = time.perf_counter()
+    bucket = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{label:<12} {elapsed:8.2f}s  peak python {peak / 2**20:8.1f} MiB  "
+          f"max RSS {max_rss:8.1f} MiB  {len(bucket)} rows")
+    return bucket
+
+
+try:
+    nb_lines = seed()
+    print(f"Seeded {nb_lines} move lines on {today} for {company.name}")
+    companies = engine._get_descendants(company, at_date=today, include_self=True)
+    # Path database dulu: max RSS proses hanya bisa naik
+    grouped = measure('read_group', lambda: engine._group_posted_move_lines(companies, today, today))
+    python = measure('search_read', lambda: engine._bucket_by_company_account(
+        engine._pull_posted_move_lines(companies, today, today)))
+    assert grouped.keys() == python.keys()
+    for key, vals in grouped.items():
+        for fname in ('debit', 'credit', 'balance'):
+            assert abs(vals[fname] - python[key][fname]) < 0.01, (key, fname)
+finally:
+    env.cr.rollback()
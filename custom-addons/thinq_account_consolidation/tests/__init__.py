@@ -0,0 +1,3 @@
+from . import test_consolidation_live
+from . import test_consolidation_snapshot
+from . import test_consolidation_ic_pair
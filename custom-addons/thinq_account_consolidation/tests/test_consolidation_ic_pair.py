@@ -0,0 +1,69 @@
+from odoo import Command
+from odoo.tests import tagged
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+
+@tagged('post_install', '-at_install')
+class TestConsolidationIcPair(AccountTestInvoicingCommon):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Pair = cls.env['consolidation.ic.pair']
+        cls.counterpart = cls.env['res.company'].create({'name': 'IC Counterpart'})
+        cls.receivable = cls.company_data['default_account_receivable']
+        cls.revenue = cls.company_data['default_account_revenue']
+
+    def _create_move(self, partner):
+        return self.env['account.move'].create({
+            'move_type': 'entry',
+            'date': '2019-03-15',
+            'journal_id': self.company_data['default_journal_misc'].id,
+            'line_ids': [
+                Command.create({'account_id': self.receivable.id, 'partner_id': partner.id, 'debit': 100.0}),
+                Command.create({'account_id': self.revenue.id, 'credit': 100.0}),
+            ],
+        })
+
+    def _balance(self):
+        return sum(self.Pair.search([
+            ('company_id', '=', self.env.company.id),
+            ('counterpart_company_id', '=', self.counterpart.id),
+            ('account_type', '=', 'asset_receivable'),
+            ('period', '=', '2019-03-01'),
+        ]).mapped('balance'))
+
+    def test_post_and_reset_to_draft(self):
+        move = self._create_move(self.counterpart.partner_id)
+        move.action_post()
+        self.assertEqual(self._balance(), 100.0)
+        move.button_draft()
+        self.assertEqual(self._balance(), 0.0)
+
+    def test_cancel(self):
+        move = self._create_move(self.counterpart.partner_id)
+        move.action_post()
+        move.button_cancel()
+        self.assertEqual(self._balance(), 0.0)
+
+    def test_posted_line_partner_edit(self):
+        move = self._create_move(self.partner_a)
+        move.action_post()
+        self.assertEqual(self._balance(), 0.0)
+        receivable_line = move.line_ids.filtered(lambda line: line.account_id == self.receivable)
+        receivable_line.partner_id = self.counterpart.partner_id
+        self.assertEqual(self._balance(), 100.0)
+        receivable_line.partner_id = self.partner_a
+        self.assertEqual(self._balance(), 0.0)
+
+    def test_cron_repair(self):
+        move = self._create_move(self.counterpart.partner_id)
+        move.action_post()
+        self.env.flush_all()
+        self.env.cr.execute(
+            "UPDATE consolidation_ic_pair SET balance = 0 WHERE counterpart_company_id = %s",
+            [self.counterpart.id],
+        )
+        self.Pair.invalidate_model()
+        self.Pair._cron_repair()
+        self.assertEqual(self._balance(), 100.0)
@@ -0,0 +1,99 @@
+from unittest.mock import patch
+
+from odoo.tests.common import TransactionCase
+
+from odoo.addons.thinq_account_consolidation.wizard import consolidation_result
+
+
+class TestConsolidationLive(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.company = cls.env.company
+        cls.wizard = cls.env['consolidated.report.wizard'].create({
+            'root_company_id': cls.company.id,
+            'date_from': '2025-01-01',
+            'date_to': '2025-12-31',
+            'result_mode': 'live',
+        })
+        cls.rows = [{
+            'wizard_id': cls.wizard.id,
+            'statement': 'BS',
+            'section': 'Assets',
+            'company_id': cls.company.id,
+            'account_code': code,
+            'account_name': name,
+            'amount': amount,
+        } for code, name, amount in [('A100', 'Cash', 10.0), ('A200', 'Bank', 5.0), ('A300', 'Petty Cash', 1.0)]]
+        cls.Result = cls.env['consolidated.report.result'].with_context(
+            consolidation_live_wizard_id=cls.wizard.id,
+            consolidation_live_statement='BS',
+            consolidation_live_title='Balance Sheet',
+            consolidation_live_token='test',
+        )
+
+    def setUp(self):
+        super().setUp()
+        consolidation_result.LIVE_ROWS_CACHE.clear()
+        self.engine_calls = 0
+
+        def prepare_result_rows(wizard, title, statement):
+            self.engine_calls += 1
+            return self.rows
+
+        patcher = patch.object(type(self.wizard), '_prepare_result_rows', prepare_result_rows)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _stored_count(self):
+        return self.env['consolidated.report.result'].search_count([('wizard_id', '=', self.wizard.id)])
+
+    def test_live_read_group_in_memory(self):
+        groups = self.Result.read_group([('account_code', '!=', 'A100')], ['amount:sum'], ['section'])
+        self.assertEqual(len(groups), 1)
+        self.assertEqual(groups[0]['amount'], 6.0)
+        self.assertEqual(self._stored_count(), 0)
+
+    def test_live_read_group_ilike(self):
+        groups = self.Result.read_group([('account_name', 'ilike', 'cash')], ['amount:sum'], ['section'])
+        self.assertEqual(len(groups), 1)
+        self.assertEqual(groups[0]['amount'], 11.0)
+        groups = self.Result.read_group([('account_name', 'not ilike', 'petty')], ['amount:sum'], ['section'])
+        self.assertEqual(groups[0]['amount'], 15.0)
+        self.assertEqual(self._stored_count(), 0)
+
+    def test_live_read_group_relation_path(self):
+        # Domain yang tidak ditangani _live_match dievaluasi ORM, tetap tanpa tulis
+        groups = self.Result.read_group([('company_id.name', '=', self.company.name)], ['amount:sum'], ['section'])
+        self.assertEqual(groups[0]['amount'], 16.0)
+        self.assertEqual(self._stored_count(), 0)
+
+    def test_live_read_group_orderby_limit(self):
+        groups = self.Result.read_group([], ['amount:sum'], ['account_code'], orderby='amount desc', limit=2)
+        self.assertEqual([group['account_code'] for group in groups], ['A100', 'A200'])
+        groups = self.Result.read_group([], ['amount:sum'], ['account_code'], orderby='amount', offset=1, limit=1)
+        self.assertEqual([group['account_code'] for group in groups], ['A200'])
+        self.assertEqual(self._stored_count(), 0)
+
+    def test_live_search_does_not_write(self):
+        groups = self.Result.read_group([], ['amount:sum'], ['account_code'])
+        petty_cash = next(group for group in groups if group['account_code'] == 'A300')
+        self.assertFalse(self.Result.search(petty_cash['__domain']))
+        self.assertEqual(self._stored_count(), 0)
+
+    def test_live_rows_expire(self):
+        self.Result.read_group([], ['amount:sum'], ['section'])
+        self.Result.read_group([], ['amount:sum'], ['account_code'])
+        self.assertEqual(self.engine_calls, 1)
+        with patch.object(consolidation_result, 'LIVE_ROWS_TTL', 0):
+            self.Result.read_group([], ['amount:sum'], ['section'])
+        self.assertEqual(self.engine_calls, 2)
+
+    def test_bulk_load_per_statement(self):
+        Result = self.env['consolidated.report.result']
+        pl_rows = [dict(row, statement='PL') for row in self.rows]
+        Result._bulk_load(self.wizard, 'BS', self.rows)
+        Result._bulk_load(self.wizard, 'PL', pl_rows)
+        Result._bulk_load(self.wizard, 'BS', self.rows[:1])
+        self.assertEqual(Result.search_count([('wizard_id', '=', self.wizard.id), ('statement', '=', 'BS')]), 1)
+        self.assertEqual(Result.search_count([('wizard_id', '=', self.wizard.id), ('statement', '=', 'PL')]), 3)
@@ -0,0 +1,71 @@
+from odoo import Command
+from odoo.tests import tagged
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+
+@tagged('post_install', '-at_install')
+class TestConsolidationSnapshot(AccountTestInvoicingCommon):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Snapshot = cls.env['consolidation.balance.snapshot']
+        cls.revenue = cls.company_data['default_account_revenue']
+        cls.expense = cls.company_data['default_account_expense']
+        cls.receivable = cls.company_data['default_account_receivable']
+
+    def _create_move(self):
+        return self.env['account.move'].create({
+            'move_type': 'entry',
+            'date': '2019-03-15',
+            'journal_id': self.company_data['default_journal_misc'].id,
+            'line_ids': [
+                Command.create({'account_id': self.receivable.id, 'debit': 100.0}),
+                Command.create({'account_id': self.revenue.id, 'credit': 100.0}),
+            ],
+        })
+
+    def _balance(self, account):
+        return sum(self.Snapshot.search([
+            ('source', '=', 'gl'),
+            ('company_id', '=', self.env.company.id),
+            ('account_id', '=', account.id),
+            ('period', '=', '2019-03-01'),
+        ]).mapped('balance'))
+
+    def test_post_and_reset_to_draft(self):
+        move = self._create_move()
+        self.assertEqual(self._balance(self.revenue), 0.0)
+        move.action_post()
+        self.assertEqual(self._balance(self.revenue), -100.0)
+        self.assertEqual(self._balance(self.receivable), 100.0)
+        move.button_draft()
+        self.assertEqual(self._balance(self.revenue), 0.0)
+        self.assertEqual(self._balance(self.receivable), 0.0)
+
+    def test_cancel(self):
+        move = self._create_move()
+        move.action_post()
+        move.button_cancel()
+        self.assertEqual(self._balance(self.revenue), 0.0)
+        self.assertEqual(self._balance(self.receivable), 0.0)
+
+    def test_posted_line_edit(self):
+        move = self._create_move()
+        move.action_post()
+        move.line_ids.filtered(lambda line: line.account_id == self.revenue).account_id = self.expense
+        self.assertEqual(self._balance(self.revenue), 0.0)
+        self.assertEqual(self._balance(self.expense), -100.0)
+        self.assertEqual(self._balance(self.receivable), 100.0)
+
+    def test_cron_repair(self):
+        move = self._create_move()
+        move.action_post()
+        self.env.flush_all()
+        self.env.cr.execute(
+            "UPDATE consolidation_balance_snapshot SET balance = 0 WHERE account_id = %s AND period = '2019-03-01'",
+            [self.revenue.id],
+        )
+        self.Snapshot.invalidate_model()
+        self.Snapshot._cron_repair()
+        self.assertEqual(self._balance(self.revenue), -100.0)
@@ -1,4 +1,6 @@
 # thinq_account_consolidation/wizard/consolidated_report_wizard.py
+import uuid
+
 from odoo import api, fields, models
 
 class ConsolidatedReportWizard(models.TransientModel):
@@ -9,6 +11,11 @@ class ConsolidatedReportWizard(models.TransientModel):
     date_from = fields.Date(required=True)
     date_to   = fields.Date(required=True)
     favourite_name = fields.Char('Save as Favourite')
+    result_mode = fields.Selection([
+        ('stored', 'Stored Rows'),
+        ('live', 'Live (Pivot/Graph only)'),
+    ], default='stored', required=True,
+        help="Live: pivot & graph membaca output engine langsung tanpa menyimpan baris hasil.")
     
     def action_generate_eliminations(self):
         self.ensure_one()
@@ -26,7 +33,8 @@ class ConsolidatedReportWizard(models.TransientModel):
         return {'type': 'ir.actions.act_window_close'}
 
 
-    def _build_results(self, title, statement):
+    def _prepare_result_rows(self, title, statement):
+        """Output engine untuk statement, dalam bentuk vals consolidated.report.result."""
         self.ensure_one()
         engine = self.env['consolidation.engine']
         if statement == 'BS':
@@ -36,9 +44,7 @@ class ConsolidatedReportWizard(models.TransientModel):
         else:
             matrix = engine.compute_cash_flow(self.root_company_id, self.date_from, self.date_to)
 
-        Result = self.env['consolidated.report.result'].sudo()
-        Result.search([('wizard_id', '=', self.id)]).unlink()
-
+        _f = self.env['consolidated.report.result']._fields.keys()
         payload = []
         for r in matrix:
             r.update({
@@ -51,13 +57,35 @@ class ConsolidatedReportWizard(models.TransientModel):
                 'statement': r.get('statement'),
                 'amount'   : r.get('amount'),
             })
-            payload.append(r)
-        if payload:
-            _f = Result._fields.keys()
-            vals = [{k: v for k, v in row.items() if k in _f} for row in payload]
-            Result.create(vals)
+            payload.append({k: v for k, v in r.items() if k in _f})
+        return payload
+
+    def _build_results(self, title, statement):
+        self.ensure_one()
+        rows = self._prepare_result_rows(title, statement)
+        self.env['consolidated.report.result'].sudo()._bulk_load(self, statement, rows)
 
     def _open_result(self, title, statement):
+        if self.result_mode == 'live':
+            return {
+                'type'     : 'ir.actions.act_window',
+                'name'     : f'Consolidated {title}',
+                'res_model': 'consolidated.report.result',
+                'view_mode': 'pivot,graph',
+                'views'    : [
+                    (False, 'pivot'),
+                    (self.env.ref('thinq_account_consolidation.view_consolidated_report_result_graph_live').id, 'graph'),
+                ],
+                'domain'   : [],
+                'target'   : 'current',
+                'context'  : {
+                    'group_by': ['section', 'company_id', 'account_id'],
+                    'consolidation_live_wizard_id': self.id,
+                    'consolidation_live_statement': statement,
+                    'consolidation_live_title': title,
+                    'consolidation_live_token': uuid.uuid4().hex,
+                },
+            }
         self._build_results(title, statement)
         return {
             'type'     : 'ir.actions.act_window',
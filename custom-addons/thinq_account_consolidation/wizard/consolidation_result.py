@@ -1,5 +1,25 @@
 # thinq_account_consolidation/models/consolidated_report_result.py
+import operator
+import re
+import time
+
 from odoo import api, fields, models
+from odoo.osv import expression
+from odoo.tools import SQL, split_every
+from odoo.tools.lru import LRU
+
+# Output engine untuk mode live, key: (db, wizard_id, write_date wizard, statement, token klik),
+# value: (waktu hitung, baris)
+LIVE_ROWS_CACHE = LRU(16)
+# Umur maksimal output live (detik) sebelum engine dijalankan ulang, supaya pivot yang
+# dibiarkan terbuka tidak terus menampilkan saldo lama
+LIVE_ROWS_TTL = 300
+# Operator yang dievaluasi _live_match; domain lain dievaluasi ORM di atas record baru
+LIVE_OPERATORS = {
+    '=': None, '!=': None, 'in': None, 'not in': None,
+    '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+    'like': None, 'ilike': None, 'not like': None, 'not ilike': None, '=like': None, '=ilike': None,
+}
 
 class ConsolidatedReportResult(models.TransientModel):
     _name = 'consolidated.report.result'
@@ -36,3 +56,219 @@ class ConsolidatedReportResult(models.TransientModel):
     def _compute_currency(self):
         for rec in self:
             rec.company_currency_id = rec.company_id.currency_id.id if rec.company_id else self.env.company.currency_id.id
+
+    # kolom yang diisi _bulk_load, sama dengan key dari wizard._prepare_result_rows
+    _bulk_columns = [
+        'wizard_id', 'title', 'root_company_id', 'date_from', 'date_to',
+        'statement', 'section', 'company_id', 'company_code',
+        'account_id', 'account_code', 'account_name',
+        'debit', 'credit', 'balance', 'amount',
+    ]
+    _live_measures = ('debit', 'credit', 'balance', 'amount')
+
+    @api.model
+    def _bulk_load(self, wizard, statement, rows, batch_size=1000):
+        """
+        Ganti hasil satu wizard untuk satu statement lewat SQL: hapus hasil lama dalam
+        satu statement lalu insert per batch, tanpa create() / compute per baris.
+        """
+        table = SQL.identifier(self._table)
+        self.env.cr.execute(SQL(
+            "DELETE FROM %s WHERE wizard_id = %s AND statement = %s", table, wizard.id, statement,
+        ))
+        columns = self._bulk_columns + ['create_uid', 'create_date', 'write_uid', 'write_date']
+        now = fields.Datetime.now()
+        for batch in split_every(batch_size, rows):
+            values = SQL(", ").join(
+                SQL("(%s)", SQL(", ").join(
+                    [None if row.get(col) is False else row.get(col) for col in self._bulk_columns]
+                    + [self.env.uid, now, self.env.uid, now]
+                ))
+                for row in batch
+            )
+            self.env.cr.execute(SQL(
+                "INSERT INTO %s (%s) VALUES %s",
+                table, SQL(", ").join(SQL.identifier(col) for col in columns), values,
+            ))
+        self.invalidate_model()
+
+    # --------------------------
+    # ==== LIVE (TANPA ROW) ====
+    # --------------------------
+    @api.model
+    def read_group(self, domain, fields, groupby, offset=0, limit=None, orderby=False, lazy=True):
+        """
+        Mode live: pivot / graph membaca output engine langsung (context
+        consolidation_live_wizard_id), tanpa menyimpan baris ke tabel. Domain, orderby
+        dan limit/offset semuanya diproses di memori: read_group bisa jalan di cursor
+        readonly, jadi tidak boleh menulis.
+        """
+        wizard_id = self.env.context.get('consolidation_live_wizard_id')
+        if not wizard_id:
+            return super().read_group(domain, fields, groupby, offset=offset, limit=limit, orderby=orderby, lazy=lazy)
+        rows = self._live_filter(self._live_rows(self.env['consolidated.report.wizard'].browse(wizard_id)), domain)
+        groups = self._live_read_group(rows, domain, fields, groupby, lazy)
+        if orderby:
+            self._live_sort(groups, orderby, groupby, lazy)
+        return groups[offset:offset + limit if limit else None]
+
+    @api.model
+    def _search(self, domain, offset=0, limit=None, order=None):
+        # Mode live tidak punya baris di tabel dan linking pivot / graph dimatikan; detail
+        # baris dibuka lewat mode Stored. Search di sini hanya membaca baris yang pernah
+        # disimpan wizard untuk statement ini, tanpa menulis apa pun.
+        wizard_id = self.env.context.get('consolidation_live_wizard_id')
+        if wizard_id:
+            domain = expression.AND([domain, [
+                ('wizard_id', '=', wizard_id),
+                ('statement', '=', self.env.context.get('consolidation_live_statement')),
+            ]])
+        return super()._search(domain, offset=offset, limit=limit, order=order)
+
+    @api.model
+    def _live_rows(self, wizard):
+        ctx = self.env.context
+        title = ctx.get('consolidation_live_title', '')
+        statement = ctx.get('consolidation_live_statement')
+        # Pivot memanggil read_group berkali-kali per tampilan, engine cukup jalan sekali per
+        # klik; wizard yang diubah atau output yang lewat LIVE_ROWS_TTL dihitung ulang
+        key = (self.env.cr.dbname, wizard.id, wizard.write_date, statement, ctx.get('consolidation_live_token'))
+        cached = LIVE_ROWS_CACHE.get(key)
+        if cached and time.monotonic() - cached[0] < LIVE_ROWS_TTL:
+            return cached[1]
+        rows = wizard._prepare_result_rows(title, statement)
+        LIVE_ROWS_CACHE[key] = (time.monotonic(), rows)
+        return rows
+
+    @api.model
+    def _live_filter(self, rows, domain):
+        """Baris output engine yang lolos domain."""
+        if not domain:
+            return rows
+        if self._live_supported(domain):
+            return [row for row in rows if self._live_match(row, domain)]
+        # Path relasi, child_of, dll: dievaluasi ORM di atas record baru (tidak ditulis ke DB)
+        return [row for row in rows if self.new(row).filtered_domain(domain)]
+
+    @api.model
+    def _live_read_group(self, rows, domain, fields, groupby, lazy):
+        groupby = [groupby] if isinstance(groupby, str) else list(groupby or [])
+        groupby = [spec.split(':')[0] for spec in (groupby[:1] if lazy else groupby)]
+        measures = [name for name in (spec.split(':')[0] for spec in fields) if name in self._live_measures]
+
+        groups = {}
+        for row in rows:
+            key = tuple(row.get(name) or False for name in groupby)
+            groups.setdefault(key, []).append(row)
+
+        result = []
+        for key in sorted(groups, key=str):
+            members = groups[key]
+            group = {}
+            group_domain = list(domain)
+            for name, value in zip(groupby, key):
+                field = self._fields[name]
+                group_domain = expression.AND([group_domain, [(name, '=', value)]])
+                if field.type == 'many2one' and value:
+                    value = (value, self.env[field.comodel_name].browse(value).display_name)
+                group[name] = value
+            for name in measures:
+                group[name] = sum(row.get(name) or 0.0 for row in members)
+            if lazy and groupby:
+                group[f'{groupby[0]}_count'] = len(members)
+            else:
+                group['__count'] = len(members)
+            group['__domain'] = group_domain
+            result.append(group)
+        return result
+
+    @api.model
+    def _live_sort(self, groups, orderby, groupby, lazy):
+        """Urutkan hasil _live_read_group sesuai orderby read_group ("amount desc, section")."""
+        groupby = [groupby] if isinstance(groupby, str) else list(groupby or [])
+        count_key = f"{groupby[0].split(':')[0]}_count" if lazy and groupby else '__count'
+        for spec in reversed(orderby.split(',')):
+            name, *direction = spec.split()
+            name = count_key if name == '__count' else name.split(':')[0]
+            # Seperti ORDER BY di PostgreSQL: NULL di akhir untuk ASC, di awal untuk DESC
+            def sort_key(group, name=name):
+                value = group.get(name)
+                if isinstance(value, tuple):
+                    value = value[1]
+                return (value is None or value is False, value if value not in (None, False) else 0)
+            groups.sort(key=sort_key, reverse=bool(direction) and direction[0].lower() == 'desc')
+
+    @api.model
+    def _live_supported(self, domain):
+        """True kalau semua leaf domain bisa dievaluasi _live_match."""
+        for token in expression.normalize_domain(domain):
+            if token in ('!', '&', '|') or tuple(token) in (expression.TRUE_LEAF, expression.FALSE_LEAF):
+                continue
+            name, operator, value = token
+            field = self._fields.get(name)
+            if not field or operator not in LIVE_OPERATORS:
+                return False
+            if operator in ('in', 'not in') and not isinstance(value, (list, tuple)):
+                return False
+            if 'like' in operator and (field.type not in ('char', 'text', 'selection') or not isinstance(value, str)):
+                return False
+            if field.type == 'many2one':
+                # Hanya perbandingan id (bukan nama / path)
+                values = value if operator in ('in', 'not in') else [value]
+                if not isinstance(values, (list, tuple)) or not all(v is False or isinstance(v, int) for v in values):
+                    return False
+        return True
+
+    @api.model
+    def _live_match(self, row, domain):
+        """Evaluasi domain (operator di LIVE_OPERATORS, cek dulu dengan _live_supported) terhadap satu baris dict."""
+        stack = []
+        for token in reversed(expression.normalize_domain(domain)):
+            if token == '!':
+                stack.append(not stack.pop())
+            elif token in ('&', '|'):
+                first, second = stack.pop(), stack.pop()
+                stack.append(first and second if token == '&' else first or second)
+            elif tuple(token) == expression.TRUE_LEAF:
+                stack.append(True)
+            elif tuple(token) == expression.FALSE_LEAF:
+                stack.append(False)
+            else:
+                name, operator, value = token
+                current = row.get(name) or False
+                field = self._fields[name]
+                if field.type in ('date', 'datetime'):
+                    # Nilai domain dari client berupa string
+                    convert = fields.Date.to_date if field.type == 'date' else fields.Datetime.to_datetime
+                    value = [convert(v) or False for v in value] if operator in ('in', 'not in') else convert(value) or False
+                if operator == '=':
+                    stack.append(current == value)
+                elif operator == '!=':
+                    stack.append(current != value)
+                elif operator == 'in':
+                    stack.append(current in value)
+                elif operator == 'not in':
+                    stack.append(current not in value)
+                elif 'like' in operator:
+                    stack.append(self._live_like(current, operator, value))
+                elif current is False or value is False:
+                    # Sama seperti SQL: NULL tidak pernah lolos perbandingan <, >
+                    stack.append(False)
+                else:
+                    stack.append(LIVE_OPERATORS[operator](current, value))
+        return all(stack)
+
+    @api.model
+    def _live_like(self, current, operator, value):
+        """Operator like / ilike (dan negasinya) seperti ORM: like biasa = substring,
+        =like / =ilike = pola SQL (% dan _)."""
+        negate = operator.startswith('not ')
+        operator = operator.removeprefix('not ')
+        if operator.startswith('='):
+            pattern = ''.join('.*' if c == '%' else '.' if c == '_' else re.escape(c) for c in value)
+        else:
+            pattern = f'.*{re.escape(value)}.*'
+        flags = re.IGNORECASE | re.DOTALL if 'ilike' in operator else re.DOTALL
+        matched = current is not False and bool(re.fullmatch(pattern, str(current), flags))
+        # Seperti ORM: "not like" juga meloloskan nilai kosong
+        return not matched if negate else matched
@@ -48,6 +48,7 @@
             'views/stock_location_views.xml',
             'views/shipment_info_template.xml',
             'security/ir.model.access.csv',
+            'data/ir_cron.xml',
     ],
     'assets': {
         'web.assets_backend': [
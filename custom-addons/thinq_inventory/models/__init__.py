@@ -8,7 +8,9 @@ from . import inventory_adjustment
 from . import stock_location
 from . import stock_return_picking
 from . import stock_quant
+from . import product_last_sale
 from . import stock_move_line
 from . import stock_move
 from . import stock_warehouse
-from . import product_label_layout
\ No newline at end of file
+from . import product_label_layout
+from . import res_company
@@ -4,8 +4,10 @@ import base64
 import pandas as pd
 from io import BytesIO
 from datetime import datetime
-from odoo import models, fields, api, _
+from dateutil.relativedelta import relativedelta
+from odoo import models, fields, api, _, Command
 from odoo.exceptions import UserError, ValidationError
+from odoo.tools import float_compare
 
 
 class ThinqInventoryAdjustment(models.Model):
@@ -37,13 +39,22 @@ class ThinqInventoryAdjustment(models.Model):
     state = fields.Selection([('draft', 'Draft'), 
                               ('recount', 'Recount'),
                               ('moved', 'Missing QTY Moved'), 
+                              ('applying', 'Applying'),
                               ('done', 'Done'), 
                               ('cancel', 'Cancelled')], string='Status', default='draft', readonly=True, copy=False)
     file_upload = fields.Binary(string="Upload File", states={'draft': [('readonly', False)]})
     file_name = fields.Char(string="File Name")
     date_done = fields.Datetime("Date Done")
     missing_qty_move_ids = fields.Many2many('stock.move', string="Missing QTY moves")
+    apply_progress = fields.Float("Apply Progress", compute='_compute_apply_progress')
+    sales_date_from = fields.Date("Sales From", default=lambda self: self._default_sales_date_from(),
+                                  help="Awal periode Sales Qty di line. Kosong = tanpa batas awal.")
+    sales_date_to = fields.Date("Sales To", help="Akhir periode Sales Qty (inklusif). Kosong = sampai sekarang.")
     
+    @api.model
+    def _default_sales_date_from(self):
+        return self.env['ir.config_parameter'].sudo().get_param('thinq_inventory.sales_date_from', '2024-01-01') or False
+
     def action_recount(self):
         self.state = 'recount'
     
@@ -104,27 +115,19 @@ class ThinqInventoryAdjustment(models.Model):
         if not lines_with_deficit:
             raise UserError(_("There are no lines with a negative difference to process."))
 
-        StockMove = self.env['stock.move']
-        moves_to_process = self.env['stock.move']
-
-        # 3. Prepare stock moves for all deficit lines
-        for line in lines_with_deficit:
+        # 3. Prepare stock moves for all deficit lines, created in one batch
+        moves_to_process = self.env['stock.move'].create([{
+            'name': _('Missing Stock: %s') % line.product_id.display_name,
+            'product_id': line.product_id.id,
             # The quantity to move is the absolute value of the negative difference
-            qty_to_move = abs(line.qty_difference)
-
-            move_vals = {
-                'name': _('Missing Stock: %s') % line.product_id.display_name,
-                'product_id': line.product_id.id,
-                'product_uom_qty': qty_to_move,
-                'product_uom': line.product_uom_id.id,
-                'location_id': source_location.id,
-                'location_dest_id': missing_location.id,
-                'reference': self.name,
-                'company_id': self.company_id.id,
-            }
-            new_move = StockMove.create(move_vals)
-            moves_to_process |= new_move
-            self.missing_qty_move_ids = [(4,new_move.id)]
+            'product_uom_qty': abs(line.qty_difference),
+            'product_uom': line.product_uom_id.id,
+            'location_id': source_location.id,
+            'location_dest_id': missing_location.id,
+            'reference': self.name,
+            'company_id': self.company_id.id,
+        } for line in lines_with_deficit])
+        self.missing_qty_move_ids = [Command.link(move.id) for move in moves_to_process]
 
         # 4. Process the moves: Confirm -> Assign -> Done
         # This sequence validates the move and triggers the accounting entries.
@@ -162,33 +165,66 @@ class ThinqInventoryAdjustment(models.Model):
             raise UserError(_("No default Scrap Location found. Please configure one in your warehouse settings."))
 
         if not self.missing_qty_move_ids:
-            for line in lines_with_deficit:
-                qty_to_scrap = abs(line.qty_difference)
-                scrap = self.env['stock.scrap'].create({
-                    'product_id': line.product_id.id,
-                    'scrap_qty': qty_to_scrap,
-                    'product_uom_id': line.product_uom_id.id,
-                    'location_id': self.location_id.id,
-                    'scrap_location_id': scrap_location.id,
-                    'origin': self.name,
-                })
-                scrap.action_validate() # This validates the scrap AND posts the journal entry
-        if self.missing_qty_move_ids:
-            for move in self.missing_qty_move_ids:
-                qty_to_scrap = abs(move.product_uom_qty)
-                scrap = self.env['stock.scrap'].create({
-                    'product_id': move.product_id.id,
-                    'scrap_qty': qty_to_scrap,
-                    'product_uom_id': move.product_id.product_tmpl_id.product_uom_id.id,
-                    'location_id': move.location_id.id,
-                    'scrap_location_id': scrap_location.id,
-                    'origin': self.name,
-                })
-                scrap.action_validate() 
+            scrap_vals = [{
+                'product_id': line.product_id.id,
+                'scrap_qty': abs(line.qty_difference),
+                'product_uom_id': line.product_uom_id.id,
+                'location_id': self.location_id.id,
+                'scrap_location_id': scrap_location.id,
+                'origin': self.name,
+            } for line in lines_with_deficit]
+        else:
+            scrap_vals = [{
+                'product_id': move.product_id.id,
+                'scrap_qty': abs(move.product_uom_qty),
+                'product_uom_id': move.product_id.product_tmpl_id.product_uom_id.id,
+                # Stok sudah dipindah ke missing location oleh action_move_missing_items
+                'location_id': move.location_dest_id.id,
+                'scrap_location_id': scrap_location.id,
+                'origin': self.name,
+            } for move in self.missing_qty_move_ids]
+        self._validate_scraps(self.env['stock.scrap'].create(scrap_vals))
 
         self.write({'state': 'done', 'date_done': fields.Datetime.now()})
         return True
 
+    def _validate_scraps(self, scraps):
+        """
+        Versi batch dari stock.scrap.action_validate / do_scrap: ketersediaan dicek sekaligus per
+        lokasi, lalu semua move scrap dibuat dengan satu create dan di-_action_done sekaligus,
+        jadi valuation layer + journal entry-nya dibuat dan di-post dalam satu batch.
+        """
+        if not scraps:
+            return
+        self._check_scrap_availability(scraps)
+        scraps._check_company()
+        for scrap in scraps:
+            scrap.name = self.env['ir.sequence'].next_by_code('stock.scrap') or _('New')
+        moves = self.env['stock.move'].create([scrap._prepare_move_values() for scrap in scraps])
+        moves.with_context(is_scrap=True)._action_done()
+        scraps.write({'state': 'done', 'date_done': fields.Datetime.now()})
+        scraps.filtered('should_replenish').do_replenish()
+
+    def _check_scrap_availability(self, scraps):
+        """Seperti cek di stock.scrap.action_validate (qty di lokasi termasuk child), satu query per lokasi."""
+        shortages = []
+        for location, location_scraps in scraps.grouped('location_id').items():
+            available = {
+                product.id: quantity
+                for product, quantity in self.env['stock.quant']._read_group(
+                    [('product_id', 'in', location_scraps.product_id.ids), ('location_id', 'child_of', location.id)],
+                    ['product_id'], ['quantity:sum'])
+            }
+            needed = {}
+            for scrap in location_scraps:
+                product = scrap.product_id
+                needed[product] = needed.get(product, 0.0) + scrap.product_uom_id._compute_quantity(scrap.scrap_qty, product.uom_id)
+            for product, quantity in needed.items():
+                if product.is_storable and float_compare(available.get(product.id, 0.0), quantity, precision_rounding=product.uom_id.rounding) < 0:
+                    shortages.append("%s @ %s" % (product.display_name, location.display_name))
+        if shortages:
+            raise UserError(_("Insufficient quantity to scrap: %s") % self._summarize_error_items(shortages))
+
     @api.model_create_multi
     def create(self, vals_list):
         """Assigns a sequence number on creation."""
@@ -197,53 +233,87 @@ class ThinqInventoryAdjustment(models.Model):
                 vals['name'] = self.env['ir.sequence'].next_by_code('thinq.inventory.adjustment') or _('New')
         return super().create(vals_list)
 
+    def _read_import_chunks(self, file_data, chunksize=50000):
+        """
+        Yield DataFrame dari file upload. CSV dibaca bertahap (chunksize baris) supaya file besar
+        tidak dimuat sekaligus; xlsx tidak bisa di-stream jadi dibaca utuh.
+        """
+        dtype = {'product_code': str}
+        if self.file_name.endswith('.xlsx'):
+            yield pd.read_excel(BytesIO(file_data), dtype=dtype)
+        elif self.file_name.endswith('.csv'):
+            yield from pd.read_csv(BytesIO(file_data), dtype=dtype, chunksize=chunksize)
+        else:
+            raise UserError(_("Unsupported file format. Please use .xlsx or .csv"))
+
+    def _aggregate_import_file(self, file_data):
+        """
+        Total counted_quantity per product_code (kode duplikat dijumlahkan), vectorised per chunk.
+        Return: pandas Series index=product_code.
+        """
+        required_columns = ['product_code', 'counted_quantity']
+        totals = []
+        invalid_rows = []
+        try:
+            for df in self._read_import_chunks(file_data):
+                # Validate that the required columns exist in the file
+                if not all(col in df.columns for col in required_columns):
+                    raise ValidationError(_("File must contain columns: %s") % ", ".join(required_columns))
+                codes = df['product_code'].str.strip()
+                quantities = pd.to_numeric(df['counted_quantity'], errors='coerce')
+                valid = codes.notna() & (codes != '')  # Skip empty rows
+                # Qty kosong / bukan angka tidak boleh jadi 0 (on-hand ter-reset); baris file = index + 2 (header)
+                invalid = valid & quantities.isna()
+                invalid_rows += ["%s (%s)" % (index + 2, code) for index, code in codes[invalid].items()]
+                totals.append(quantities[valid].groupby(codes[valid]).sum())
+        except (UserError, ValidationError):
+            raise
+        except Exception as e:
+            raise UserError(_("Failed to read file: %s") % e)
+        if invalid_rows:
+            raise UserError(_("%s row(s) have an empty or invalid counted_quantity: %s")
+                            % (len(invalid_rows), self._summarize_error_items(invalid_rows)))
+        if not totals:
+            return pd.Series(dtype=float)
+        return pd.concat(totals).groupby(level=0).sum()
+
+    @api.model
+    def _summarize_error_items(self, items, limit=50):
+        shown = ", ".join(items[:limit])
+        if len(items) > limit:
+            shown += _(" ... and %s more") % (len(items) - limit)
+        return shown
+
     def action_import_from_file(self):
         """
         Reads an uploaded Excel/CSV file and populates the adjustment lines.
         This function is triggered by a button on the view.
+        Semua kode produk di-resolve dengan satu query; kode yang tidak ditemukan dilaporkan sekaligus.
         """
         self.ensure_one()
         if not self.file_upload:
             raise UserError(_("Please upload a file first."))
 
-        # Decode the file and read it using pandas
-        try:
-            file_data = base64.b64decode(self.file_upload)
-            if self.file_name.endswith('.xlsx'):
-                df = pd.read_excel(BytesIO(file_data))
-            elif self.file_name.endswith('.csv'):
-                df = pd.read_csv(BytesIO(file_data))
-            else:
-                raise UserError(_("Unsupported file format. Please use .xlsx or .csv"))
-        except Exception as e:
-            raise UserError(_("Failed to read file: %s") % e)
+        totals = self._aggregate_import_file(base64.b64decode(self.file_upload))
 
-        # Validate that the required columns exist in the file
-        required_columns = ['product_code', 'counted_quantity']
-        if not all(col in df.columns for col in required_columns):
-            raise ValidationError(_("File must contain columns: %s") % ", ".join(required_columns))
+        # Resolve all codes at once
+        product_by_code = {}
+        products = self.env['product.product'].search_read(
+            [('default_code', 'in', totals.index.tolist())], ['default_code'], order='id')
+        for product in products:
+            product_by_code.setdefault(product['default_code'], product['id'])
+
+        missing_codes = [code for code in totals.index if code not in product_by_code]
+        if missing_codes:
+            raise UserError(_("%s product internal reference(s) not found in the system: %s")
+                            % (len(missing_codes), self._summarize_error_items(missing_codes)))
+
+        lines_to_create = [{
+            'adjustment_id': self.id,
+            'product_id': product_by_code[code],
+            'qty_counted': float(quantity),
+        } for code, quantity in totals.items()]
 
-        lines_to_create = []
-        ProductProduct = self.env['product.product']
-        
-        # Process each row in the file
-        for index, row in df.iterrows():
-            product_code = row['product_code']
-            counted_quantity = row['counted_quantity']
-
-            if not product_code:
-                continue # Skip empty rows
-
-            product = ProductProduct.search([('default_code', '=', str(product_code))], limit=1)
-            if not product:
-                raise UserError(_("Product with internal reference '%s' not found in the system.") % product_code)
-
-            lines_to_create.append({
-                'adjustment_id': self.id,
-                'product_id': product.id,
-                'qty_counted': float(counted_quantity),
-            })
-        
         # For simplicity, clear existing lines before adding new ones from the file
         self.adjustment_line_ids.unlink()
         self.env['thinq.inventory.adjustment.line'].create(lines_to_create)
@@ -256,42 +326,91 @@ class ThinqInventoryAdjustment(models.Model):
         """
         Applies inventory adjustments by setting the `inventory_quantity`
         on the correct stock.quant, which is the standard Odoo method.
+        Semua line diproses sekaligus lewat _apply_lines_to_quants.
         """
         self.ensure_one()
         if not self.adjustment_line_ids:
             raise UserError(_("You must add at least one product to adjust."))
 
-        for line in self.adjustment_line_ids:
-            # Skip lines where the quantity hasn't changed.
-            if line.qty_on_hand == line.qty_counted:
-                continue
+        self._apply_lines_to_quants(self.adjustment_line_ids.filtered(lambda l: not l.is_applied))
+        self.write({'state': 'done','date_done': datetime.now()})
+        return True
 
-            # Find the specific quant for the product in the location (assuming no lots/packages).
-            quant = self.env['stock.quant'].search([
-                ('product_id', '=', line.product_id.id),
-                ('location_id', '=', self.location_id.id),
-                ('lot_id', '=', False),
-                ('package_id', '=', False),
-                ('owner_id', '=', False),
-            ], limit=1)
+    def action_apply_in_background(self):
+        """Antrikan apply adjustment ke cron (untuk recount besar yang bisa timeout di request HTTP)."""
+        self.ensure_one()
+        if not self.adjustment_line_ids:
+            raise UserError(_("You must add at least one product to adjust."))
+        self.write({'state': 'applying'})
+        self.env.ref('thinq_inventory.ir_cron_apply_inventory_adjustment')._trigger()
+        return True
 
+    @api.depends('adjustment_line_ids.is_applied')
+    def _compute_apply_progress(self):
+        for adjustment in self:
+            lines = adjustment.adjustment_line_ids
+            applied = len(lines.filtered('is_applied'))
+            adjustment.apply_progress = 100.0 * applied / len(lines) if lines else 0.0
+
+    def _apply_lines_to_quants(self, lines):
+        """
+        Apply qty_counted dari lines ke quant lokasi adjustment (tanpa lot/package/owner):
+        satu search untuk semua quant, quant yang belum ada dibuat sekaligus, lalu satu
+        panggilan _apply_inventory untuk seluruh recordset.
+        """
+        self.ensure_one()
+        if not lines:
+            return
+        Quant = self.env['stock.quant'].with_context(inventory_mode=True)
+        quant_by_product = {}
+        for quant in Quant.search([
+            ('product_id', 'in', lines.product_id.ids),
+            ('location_id', '=', self.location_id.id),
+            ('lot_id', '=', False),
+            ('package_id', '=', False),
+            ('owner_id', '=', False),
+        ], order='id'):
+            quant_by_product.setdefault(quant.product_id.id, quant)
+
+        to_apply = Quant
+        to_create = []
+        for line in lines:
+            quant = quant_by_product.get(line.product_id.id)
+            # Skip lines where the quantity hasn't changed.
+            if quant and quant.quantity == line.qty_counted:
+                continue
             if quant:
-                # If a quant exists, writing to `inventory_quantity` triggers the update.
                 quant.inventory_quantity = line.qty_counted
-                quant._apply_inventory()
-            else:
+                to_apply |= quant
+            elif line.qty_counted:
                 # If no quant exists (on-hand is 0), create a new one.
-                # The `inventory_mode` context is key to allow creating a quant
-                # and applying the initial inventory.
-                quant = self.env['stock.quant'].with_context(inventory_mode=True).create({
+                to_create.append({
                     'product_id': line.product_id.id,
                     'location_id': self.location_id.id,
                     'inventory_quantity': line.qty_counted,
                 })
-                quant._apply_inventory()
-
-        self.write({'state': 'done','date_done': datetime.now()})
-        return True
+        if to_create:
+            to_apply |= Quant.create(to_create)
+        if to_apply:
+            to_apply._apply_inventory()
+        lines.write({'is_applied': True})
+
+    @api.model
+    def _cron_apply_inventory_adjustments(self, batch_size=1000):
+        """
+        Proses satu batch line dari adjustment berstatus 'applying'. Progress dilaporkan ke
+        ir.cron; selama masih ada sisa, cron dijalankan ulang (commit per batch).
+        """
+        adjustment = self.search([('state', '=', 'applying')], order='id', limit=1)
+        if not adjustment:
+            return
+        Line = self.env['thinq.inventory.adjustment.line']
+        lines = Line.search([('adjustment_id', '=', adjustment.id), ('is_applied', '=', False)], order='id', limit=batch_size)
+        adjustment._apply_lines_to_quants(lines)
+        if not Line.search_count([('adjustment_id', '=', adjustment.id), ('is_applied', '=', False)], limit=1):
+            adjustment.write({'state': 'done', 'date_done': fields.Datetime.now()})
+        remaining = Line.search_count([('adjustment_id.state', '=', 'applying'), ('is_applied', '=', False)])
+        self.env['ir.cron']._notify_progress(done=len(lines), remaining=remaining)
 
 class ThinqInventoryAdjustmentLine(models.Model):
     """
@@ -310,50 +429,55 @@ class ThinqInventoryAdjustmentLine(models.Model):
     qty_difference = fields.Float(string='Difference', readonly=True, compute='_compute_recalculate', store=True, digits='Product Unit of Measure')
     qty_sales = fields.Float(string="Sales Qty", compute="_get_quantity_sold")
     qty_final = fields.Float(string="Qty On Hand (Final)")
+    is_applied = fields.Boolean("Applied", readonly=True, copy=False, help="Sudah di-apply ke stock.quant.")
     product_uom_id = fields.Many2one('uom.uom', related='product_id.uom_id', readonly=True)
     
+    @api.depends('product_id', 'adjustment_id.sales_date_from', 'adjustment_id.sales_date_to')
     def _get_quantity_sold(self):
         """
-        Calculates the total sold quantity for a given product within an optional date range.
-        :param product_id: The product.product record for which to calculate the sales.
-        :param start_date: The start date of the period (optional).
-        :param end_date: The end date of the period (optional).
-        :return: The total quantity sold as a float.
+        Calculates the total sold quantity (confirmed sale order lines) per product within the
+        adjustment's sales date range. Satu aggregate sale.order.line per adjustment.
         """
-        for rec in self:
-            product_id = rec.product_id
-            start_date = "2024-01-01"
-            end_date = datetime.now()
-            if not product_id:
-                return 0.0
-            # Define the domain to filter sale order lines
+        self.qty_sales = 0.0
+        for adjustment, lines in self.grouped('adjustment_id').items():
+            products = lines.product_id._origin
+            if not products:
+                continue
             domain = [
-                ('product_id', '=', product_id.id),
-                ('order_id.state', 'in', ['sale', 'done']) # Only include confirmed sales
+                ('product_id', 'in', products.ids),
+                ('order_id.state', 'in', ['sale', 'done']),  # Only include confirmed sales
             ]
-            # Add date range to the domain if specified
-            if start_date:
-                domain.append(('order_id.date_order', '>=', start_date))
-            if end_date:
-                domain.append(('order_id.date_order', '<=', end_date))
-            # Search for the sale order lines matching the domain
-            order_lines = self.env['sale.order.line'].search(domain)
-            # Sum the quantities from the found lines
-            total_sold = sum(line.product_uom_qty for line in order_lines)
-            rec.qty_sales = total_sold
+            if adjustment.sales_date_from:
+                domain.append(('order_id.date_order', '>=', adjustment.sales_date_from))
+            if adjustment.sales_date_to:
+                domain.append(('order_id.date_order', '<', adjustment.sales_date_to + relativedelta(days=1)))
+            sold = {
+                product.id: qty
+                for product, qty in self.env['sale.order.line']._read_group(domain, ['product_id'], ['product_uom_qty:sum'])
+            }
+            for line in lines:
+                line.qty_sales = sold.get(line.product_id._origin.id, 0.0)
 
     @api.depends('product_id', 'location_id')
     def _compute_on_hand(self):
         """
-        Computes the on-hand quantity for the product in the specified location.
+        Computes the on-hand quantity for the product in the specified location
+        (termasuk child location, sama seperti qty_available dengan context location).
+        Satu grouped query stock.quant per lokasi.
         """
-        for line in self:
-            if not line.product_id or not line.location_id:
-                line.qty_on_hand = 0.0
+        self.qty_on_hand = 0.0
+        for location, lines in self.grouped('location_id').items():
+            products = lines.product_id._origin
+            if not location or not products:
                 continue
-            
-            # Use the product's own method to get quantity, which is more robust
-            line.qty_on_hand = line.product_id.with_context(location=line.location_id.id).qty_available
+            on_hand = {
+                product.id: qty
+                for product, qty in self.env['stock.quant']._read_group(
+                    [('product_id', 'in', products.ids), ('location_id', 'child_of', location._origin.id)],
+                    ['product_id'], ['quantity:sum'])
+            }
+            for line in lines:
+                line.qty_on_hand = on_hand.get(line.product_id._origin.id, 0.0)
 
     @api.depends('qty_on_hand', 'qty_counted')
     def _compute_recalculate(self):
@@ -0,0 +1,111 @@
+# thinq_inventory/models/product_last_sale.py
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+
+class ThinqProductLastSale(models.Model):
+    """
+    Tanggal keluar (outgoing move done) terakhir per (product, company). Dijaga incremental
+    dari stock.move._action_done dan di-sync ke stock.quant.last_sale_date / inventory_aging
+    supaya list aging tidak query stock.move per baris.
+    """
+    _name = 'thinq.product.last.sale'
+    _description = 'Product Last Outgoing Date'
+    _order = 'last_sale_date desc'
+
+    product_id = fields.Many2one('product.product', required=True, readonly=True, ondelete='cascade')
+    company_id = fields.Many2one('res.company', required=True, readonly=True, ondelete='cascade')
+    last_sale_date = fields.Datetime(required=True, readonly=True)
+
+    _sql_constraints = [
+        ('unique_product_company', 'unique(product_id, company_id)',
+         'Only one last sale date per product and company.')
+    ]
+
+    def init(self):
+        self.env.cr.execute(SQL("SELECT 1 FROM %s LIMIT 1", SQL.identifier(self._table)))
+        if not self.env.cr.rowcount:
+            self.rebuild()
+
+    def _outgoing_moves_query(self, move_ids=None):
+        """Move done dari picking bertipe outgoing (opsional dibatasi id move), di-group per product/company."""
+        where = SQL("sm.state = 'done' AND spt.code = 'outgoing' AND sm.company_id IS NOT NULL")
+        if move_ids is not None:
+            where = SQL("%s AND sm.id IN %s", where, tuple(move_ids))
+        # date_done picking baru di-set setelah move done, fallback ke tanggal move
+        return SQL("""
+            SELECT sm.product_id, sm.company_id, MAX(COALESCE(sp.date_done, sm.date)) AS last_sale_date
+              FROM stock_move sm
+              JOIN stock_picking sp ON sp.id = sm.picking_id
+              JOIN stock_picking_type spt ON spt.id = sp.picking_type_id
+             WHERE %s
+          GROUP BY sm.product_id, sm.company_id
+        """, where)
+
+    def _upsert(self, moves_query):
+        self.env.cr.execute(SQL("""
+            INSERT INTO %(table)s (product_id, company_id, last_sale_date)
+            SELECT src.product_id, src.company_id, src.last_sale_date FROM (%(moves)s) src
+            ON CONFLICT (product_id, company_id) DO UPDATE
+               SET last_sale_date = GREATEST(%(table)s.last_sale_date, EXCLUDED.last_sale_date)
+            RETURNING product_id
+        """, table=SQL.identifier(self._table), moves=moves_query))
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    def _sync_quants(self, product_ids=None):
+        """Salin last_sale_date ke stock.quant dan hitung inventory_aging (hari, dibulatkan ke bawah)."""
+        where = SQL("q.last_sale_date IS DISTINCT FROM t.last_sale_date")
+        if product_ids is not None:
+            if not product_ids:
+                return
+            where = SQL("%s AND t.product_id IN %s", where, tuple(product_ids))
+        self.env.cr.execute(SQL("""
+            UPDATE stock_quant q
+               SET last_sale_date = t.last_sale_date,
+                   inventory_aging = EXTRACT(DAY FROM (NOW() AT TIME ZONE 'UTC') - t.last_sale_date)
+              FROM %(table)s t
+             WHERE t.product_id = q.product_id AND t.company_id = q.company_id AND %(where)s
+        """, table=SQL.identifier(self._table), where=where))
+        self.env['stock.quant'].invalidate_model(['last_sale_date', 'inventory_aging'])
+
+    @api.model
+    def rebuild(self):
+        """Backfill: hitung ulang seluruh tabel dari stock.move lalu sync semua quant."""
+        self.env.flush_all()
+        self.env.cr.execute(SQL("DELETE FROM %s", SQL.identifier(self._table)))
+        self._upsert(self._outgoing_moves_query())
+        self.env.cr.execute(SQL(
+            "UPDATE stock_quant SET last_sale_date = NULL, inventory_aging = 0 WHERE last_sale_date IS NOT NULL"))
+        self._sync_quants()
+        self.invalidate_model()
+        return True
+
+    @api.model
+    def _apply_moves(self, moves):
+        """Update tabel dari move yang baru done (hanya outgoing yang berpengaruh)."""
+        if not moves:
+            return
+        self.env['stock.move'].flush_model(['state', 'product_id', 'company_id', 'picking_id', 'date'])
+        self.env['stock.picking'].flush_model(['date_done', 'picking_type_id'])
+        product_ids = self._upsert(self._outgoing_moves_query(moves.ids))
+        self._sync_quants(product_ids)
+        self.invalidate_model()
+
+    @api.model
+    def _get_last_sale_dates(self, product_ids):
+        """{(product_id, company_id): last_sale_date}"""
+        return {
+            (row['product_id'][0], row['company_id'][0]): row['last_sale_date']
+            for row in self.search_read([('product_id', 'in', product_ids)], ['product_id', 'company_id', 'last_sale_date'])
+        }
+
+    @api.model
+    def _cron_refresh_inventory_aging(self):
+        """inventory_aging bergantung pada tanggal hari ini, jadi di-refresh harian."""
+        self.env['stock.quant'].flush_model(['last_sale_date'])
+        self.env.cr.execute(SQL("""
+            UPDATE stock_quant
+               SET inventory_aging = EXTRACT(DAY FROM (NOW() AT TIME ZONE 'UTC') - last_sale_date)
+             WHERE last_sale_date IS NOT NULL
+        """))
+        self.env['stock.quant'].invalidate_model(['inventory_aging'])
@@ -0,0 +1,97 @@
+import logging
+import threading
+
+from odoo import api, models, tools
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+# Tabel yang punya kolom entity_id / branch_id hasil get_entity
+ENTITY_BRANCH_TABLES = ('stock_quant', 'stock_move_line')
+
+
+class ResCompany(models.Model):
+    _inherit = 'res.company'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        companies = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return companies
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'parent_id' in vals:
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    @api.model
+    @tools.ormcache()
+    def _get_entity_branch_map(self):
+        """
+        {company_id: (entity_id, branch_id)}: company dengan parent -> (parent, company),
+        company tanpa parent -> (company, False).
+        """
+        self.env.cr.execute("SELECT id, parent_id FROM res_company")
+        return {
+            company_id: (parent_id, company_id) if parent_id else (company_id, False)
+            for company_id, parent_id in self.env.cr.fetchall()
+        }
+
+    @api.model
+    def _assign_entity_branch(self, records):
+        """Isi entity_id / branch_id records (punya company_id) per company, tanpa baca company per record."""
+        entity_map = self._get_entity_branch_map()
+        for company, recs in records.grouped('company_id').items():
+            entity_id, branch_id = entity_map.get(company.id, (False, False))
+            recs.entity_id = entity_id
+            recs.branch_id = branch_id
+
+    @api.model
+    def repair_entity_branch(self, batch_size=100000):
+        """
+        Backfill / perbaiki entity_id & branch_id di stock.quant dan stock.move.line langsung
+        di SQL, per batch id (commit per batch). Aturan sama dengan _get_entity_branch_map;
+        baris tanpa company dikosongkan.
+        """
+        self.env.flush_all()
+        nb_updated = 0
+        for table in ENTITY_BRANCH_TABLES:
+            last_id = 0
+            while True:
+                self.env.cr.execute(SQL("""
+                    WITH batch AS (
+                        SELECT id FROM %(table)s WHERE id > %(last_id)s ORDER BY id LIMIT %(batch_size)s
+                    ), target AS (
+                        SELECT s.id, COALESCE(c.parent_id, c.id) AS entity_id,
+                               CASE WHEN c.parent_id IS NOT NULL THEN c.id END AS branch_id
+                          FROM batch
+                          JOIN %(table)s s ON s.id = batch.id
+                     LEFT JOIN res_company c ON c.id = s.company_id
+                    ), updated AS (
+                        UPDATE %(table)s t
+                           SET entity_id = target.entity_id, branch_id = target.branch_id
+                          FROM target
+                         WHERE t.id = target.id
+                           AND (t.entity_id IS DISTINCT FROM target.entity_id
+                                OR t.branch_id IS DISTINCT FROM target.branch_id)
+                     RETURNING t.id
+                    )
+                    SELECT (SELECT max(id) FROM batch), (SELECT count(*) FROM updated)
+                """, table=SQL.identifier(table), last_id=last_id, batch_size=batch_size))
+                batch_last_id, batch_updated = self.env.cr.fetchone()
+                if not batch_last_id:
+                    break
+                last_id = batch_last_id
+                nb_updated += batch_updated
+                if not getattr(threading.current_thread(), 'testing', False):
+                    self.env.cr.commit()
+        self.env['stock.quant'].invalidate_model(['entity_id', 'branch_id'])
+        self.env['stock.move.line'].invalidate_model(['entity_id', 'branch_id'])
+        _logger.info("entity/branch repaired on %s stock.quant / stock.move.line rows", nb_updated)
+        return nb_updated
@@ -10,4 +10,10 @@ class StockMove(models.Model):
         for move in self:
             move.display_name = '%s%s' % (
                 move.product_id.name,
-                move.picking_id.origin and ' (%s)' % move.picking_id.origin or '')
\ No newline at end of file
+                move.picking_id.origin and ' (%s)' % move.picking_id.origin or '')
+
+    def _action_done(self, cancel_backorder=False):
+        moves = super()._action_done(cancel_backorder=cancel_backorder)
+        self.env['thinq.product.last.sale'].sudo()._apply_moves(
+            moves.filtered(lambda m: m.state == 'done' and m.picking_id))
+        return moves
@@ -9,13 +9,5 @@ class StockMoveLine(models.Model):
     
     @api.depends('company_id')
     def get_entity(self):
-        for rec in self:
-            company_id = rec.env.user.company_id.id
-            branch_id = False
-            if rec.company_id and rec.company_id.parent_id:
-                company_id = rec.company_id.sudo().parent_id.id
-                branch_id = rec.company_id.id
-            elif rec.company_id and not rec.company_id.parent_id:
-                company_id = rec.company_id.id
-            rec.entity_id = company_id
-            rec.branch_id = branch_id
\ No newline at end of file
+        # Entity = parent company (atau company itu sendiri), branch = company jika punya parent
+        self.env['res.company']._assign_entity_branch(self)
\ No newline at end of file
@@ -7,12 +7,16 @@ class StockQuant(models.Model):
     last_sale_date = fields.Datetime(
         'Last Sale Date',
         compute='_compute_last_sale_date',
+        store=True,
+        index=True,
+        help="Tanggal outgoing move done terakhir untuk product + company ini (thinq.product.last.sale).",
     )
 
     inventory_aging = fields.Integer(
         'Inventory Aging (Days)',
         compute='_compute_inventory_aging',
-        help="Today - Last Sale Date"
+        store=True,
+        help="Today - Last Sale Date (di-refresh harian oleh cron)",
     )
     
     entity_id = fields.Many2one('res.company', string='Entity', compute='get_entity', store=True)
@@ -20,27 +24,14 @@ class StockQuant(models.Model):
     
     @api.depends('company_id')
     def get_entity(self):
-        for rec in self:
-            company_id = rec.env.user.company_id.id
-            branch_id = False
-            if rec.company_id and rec.company_id.parent_id:
-                company_id = rec.company_id.sudo().parent_id.id
-                branch_id = rec.company_id.id
-            elif rec.company_id and not rec.company_id.parent_id:
-                company_id = rec.company_id.id
-            rec.entity_id = company_id
-            rec.branch_id = branch_id
+        # Entity = parent company (atau company itu sendiri), branch = company jika punya parent
+        self.env['res.company']._assign_entity_branch(self)
 
-    @api.depends('product_id')
+    @api.depends('product_id', 'company_id')
     def _compute_last_sale_date(self):
-        Move = self.env['stock.move'].with_context(active_test=False)
+        last_sale = self.env['thinq.product.last.sale'].sudo()._get_last_sale_dates(self.product_id.ids)
         for quant in self:
-            last_move = Move.search([
-                ('product_id', '=', quant.product_id.id),
-                ('picking_id.picking_type_id.code', '=', 'outgoing'),
-                ('state', '=', 'done'),
-            ], order='date desc', limit=1)
-            quant.last_sale_date = last_move.picking_id.date_done or False
+            quant.last_sale_date = last_sale.get((quant.product_id.id, quant.company_id.id), False)
 
     @api.depends('last_sale_date')
     def _compute_inventory_aging(self):
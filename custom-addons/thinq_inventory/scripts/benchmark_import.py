@@ -0,0 +1,50 @@
+# thinq_inventory/scripts/benchmark_import.py
+"""
+Benchmark import file inventory adjustment (thinq.inventory.adjustment.action_import_from_file).
+
+Membuat CSV N baris (default 100k) dari default_code produk yang ada (dengan duplikat),
+lalu mengukur waktu baca + agregasi, resolve kode, dan create line. Data di-rollback di akhir.
+
+    N=100000 odoo-bin shell -d <db> --no-http \
+        < thinq_inventory/scripts/benchmark_import.py
+
+Variabel `env` disediakan oleh odoo shell.
+"""
+import base64
+import os
+import random
+import resource
+import time
+
+N = int(os.environ.get('N', 100000))
+
+codes = [c for c in env['product.product'].search([('default_code', '!=', False)]).mapped('default_code')]
+if not codes:
+    raise SystemExit("No product with an internal reference to benchmark with")
+location = env['stock.location'].search([('usage', '=', 'internal')], limit=1)
+
+rows = ["product_code,counted_quantity"]
+rows += [f"{random.choice(codes)},{random.randint(0, 20)}" for _i in range(N)]
+file_data = "\n".join(rows).encode()
+
+try:
+    adjustment = env['thinq.inventory.adjustment'].create({
+        'location_id': location.id,
+        'file_upload': base64.b64encode(file_data),
+        'file_name': 'benchmark.csv',
+    })
+
+    start = time.perf_counter()
+    totals = adjustment._aggregate_import_file(file_data)
+    aggregated = time.perf_counter()
+    print(f"read + aggregate  {aggregated - start:8.2f}s  {N} rows -> {len(totals)} codes")
+
+    start = time.perf_counter()
+    adjustment.action_import_from_file()
+    env.flush_all()
+    elapsed = time.perf_counter() - start
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"full import       {elapsed:8.2f}s  {len(adjustment.adjustment_line_ids)} lines  "
+          f"{N / elapsed:,.0f} rows/s  max RSS {max_rss:.1f} MiB")
+finally:
+    env.cr.rollback()
@@ -18,6 +18,7 @@
     ],
     'data': [
         'security/ir.model.access.csv',
+        'data/ir_cron.xml',
 
         'reports/invoice_report_template.xml',
         'reports/invoice_report.xml',
@@ -8,4 +8,5 @@ from . import loyalty_reward
 from . import loyalty_generate_code
 from . import pos_promotion
 from . import pos_config
-from . import stock_picking
\ No newline at end of file
+from . import stock_picking
+from . import ir_actions_report
@@ -0,0 +1,13 @@
+from odoo import models
+
+
+class IrActionsReport(models.Model):
+    _inherit = 'ir.actions.report'
+
+    def _render_qweb_pdf(self, report_ref, res_ids=None, data=None):
+        result = super()._render_qweb_pdf(report_ref, res_ids=res_ids, data=data)
+        # PDF invoice POS baru saja disimpan dengan nama terbaru, buang versi sebelumnya
+        report = self._get_report(report_ref)
+        if res_ids and report == self.env.ref('thinq_pos.action_report_pos_invoice', raise_if_not_found=False):
+            self.env['pos.order'].browse(res_ids).exists()._unlink_outdated_invoice_pdfs()
+        return result
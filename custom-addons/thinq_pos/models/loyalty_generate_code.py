@@ -1,5 +1,10 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
+from odoo.tools import SQL, split_every
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
 
 
 class LoyaltyGenerateWizard(models.TransientModel):
@@ -52,65 +57,76 @@ class LoyaltyGenerateWizard(models.TransientModel):
         # Only call original method for random format
         return super().generate_coupons()
 
-    def _generate_predefined_coupons(self):
-        """Generate coupons with predefined format"""
-        # Get existing codes to avoid duplicates
-        existing_codes = self.env['loyalty.card'].search([
-            ('program_id', '=', self.program_id.id)
-        ]).mapped('code')
+    def _free_predefined_numbers(self, quantity):
+        """
+        Nomor urut yang kodenya (PREFIX + nomor zero-padded) belum dipakai kartu manapun.
+        Anti-join generate_series vs loyalty_card di database (kode loyalty.card unik global),
+        LIMIT membuat Postgres berhenti begitu cukup nomor ditemukan.
+        """
+        upper = max(10 ** self.code_digits - 1, 999999)
+        self.env['loyalty.card'].flush_model(['code'])
+        self.env.cr.execute(SQL("""
+            SELECT n
+              FROM generate_series(1, %(upper)s) n
+             WHERE NOT EXISTS (
+                       SELECT 1 FROM loyalty_card c
+                        WHERE c.code = %(prefix)s || lpad(n::text, greatest(%(digits)s, length(n::text)), '0')
+                   )
+          ORDER BY n
+             LIMIT %(quantity)s
+        """, upper=upper, prefix=self.code_prefix, digits=self.code_digits, quantity=quantity))
+        numbers = [row[0] for row in self.env.cr.fetchall()]
+        if len(numbers) < quantity:
+            raise ValidationError(_("Unable to generate enough unique codes. Please adjust your prefix or digits."))
+        return numbers
 
-        # Generate sequential codes
-        generated_codes = []
-        counter = 1
-        codes_to_generate = self.coupon_qty
+    def _generate_predefined_coupons(self, batch_size=10000):
+        """Generate coupons with predefined format, kartu & history dibuat per batch"""
+        start = time.perf_counter()
+        numbers = self._free_predefined_numbers(self.coupon_qty)
 
-        while len(generated_codes) < codes_to_generate:
-            # Format: PREFIX + zero-padded number
-            code = f"{self.code_prefix}{str(counter).zfill(self.code_digits)}"
-            
-            # Check if code already exists
-            if code not in existing_codes and code not in generated_codes:
-                generated_codes.append(code)
-            
-            counter += 1
-            
-            # Safety check to prevent infinite loop
-            if counter > 999999:
-                raise ValidationError(_("Unable to generate enough unique codes. Please adjust your prefix or digits."))
+        Card = self.env['loyalty.card'].with_context(loyalty_no_mail=True, tracking_disable=True)
+        History = self.env['loyalty.history']
+        partner_id = self.mode == 'selected' and self.partner_id.id or False
+        points = self.points_granted or 0.0
+        description = self.description or 'Generated coupon'
 
-        # Create loyalty cards with predefined codes directly
-        loyalty_cards_vals = []
-        for code in generated_codes:
-            card_vals = {
+        card_ids = []
+        for batch in split_every(batch_size, numbers):
+            created_cards = Card.create([{
                 'program_id': self.program_id.id,
-                'partner_id': self.mode == 'selected' and self.partner_id.id or False,
-                'code': code,
-                'points': self.points_granted or 0.0,
-            }
-            loyalty_cards_vals.append(card_vals)
+                'partner_id': partner_id,
+                'code': f"{self.code_prefix}{str(number).zfill(self.code_digits)}",
+                'points': points,
+            } for number in batch])
+            History.create([{
+                'card_id': card_id,
+                'description': description,
+                'issued': points,
+                'used': 0.0,
+            } for card_id in created_cards.ids])
+            card_ids += created_cards.ids
+            # jaga memori tetap kecil untuk generate ratusan ribu kode
+            self.env.flush_all()
+            self.env.invalidate_all()
 
-        # Create all loyalty cards at once
-        created_cards = self.env['loyalty.card'].create(loyalty_cards_vals)
+        elapsed = time.perf_counter() - start
+        _logger.info("Generated %s predefined coupons for program %s in %.2fs (%.0f codes/s)",
+                     len(card_ids), self.program_id.id, elapsed, len(card_ids) / (elapsed or 1.0))
 
-        # Create history records for each card
-        for card in created_cards:
-            history_vals = {
-                'card_id': card.id,
-                'description': self.description or 'Generated coupon',
-                'issued': self.points_granted or 0.0,
-                'used': 0.0,
-                'create_date': fields.Datetime.now(),
-            }
-            self.env['loyalty.history'].create(history_vals)
-            
         # Return proper action to show generated coupons (like original method)
         try:
             action = self.env.ref('loyalty.loyalty_card_action').read()[0]
+            if len(card_ids) <= batch_size:
+                domain = [('id', 'in', card_ids)]
+            else:
+                domain = [('program_id', '=', self.program_id.id),
+                          ('id', '>=', min(card_ids)), ('id', '<=', max(card_ids))]
             action.update({
-                'domain': [('id', 'in', created_cards.ids)],
+                'domain': domain,
                 'context': {'create': False},
             })
             return action
         except:
             # Fallback: just close the wizard if action not found
-            return {'type': 'ir.actions.act_window_close'}
\ No newline at end of file
+            return {'type': 'ir.actions.act_window_close'}
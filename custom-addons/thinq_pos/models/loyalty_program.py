@@ -1,4 +1,4 @@
-from odoo import api, fields, models
+from odoo import api, fields, models, tools
 
 
 class LoyaltyProgramInherit(models.Model):
@@ -36,4 +36,51 @@ class LoyaltyProgramInherit(models.Model):
         "Total Order Count", 
         compute="_compute_total_order_count", 
         store=True,  # untuk filter di list view
-    )
\ No newline at end of file
+    )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        programs = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return programs
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    @api.model
+    @tools.ormcache('program_id')
+    def _get_coupon_rule_conditions(self, program_id):
+        """
+        Syarat coupon per program yang sudah "dicompile": (date_to, minimum_qty, minimum_amount).
+        Diambil dari rule pertama yang punya minimum qty/amount, di-cache sampai program/rule berubah.
+        """
+        program = self.sudo().browse(program_id)
+        rule = program.rule_ids.filtered(lambda r: r.minimum_qty > 0 or r.minimum_amount > 0)[:1]
+        return (program.date_to, rule.minimum_qty or 0, rule.minimum_amount or 0.0)
+
+
+class LoyaltyRuleInherit(models.Model):
+    _inherit = 'loyalty.rule'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        rules = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return rules
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
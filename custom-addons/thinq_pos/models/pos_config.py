@@ -1,10 +1,17 @@
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError, ValidationError
 import logging
+import math
 import re
+from datetime import timedelta
 
 _logger = logging.getLogger(__name__)
 
+POINTS_DISPLAY_NUMBER = re.compile(r'\d+')
+# Transaksi yang mulai sebelum stamp tapi commit sesudahnya punya write_date < stamp;
+# poll berikutnya mengecek ulang mundur sejauh ini supaya perubahannya tidak terlewat
+POS_STOCK_MAP_OVERLAP = timedelta(minutes=5)
+
 class PosConfig(models.Model):
     _inherit = 'pos.config'
 
@@ -20,6 +27,84 @@ class PosConfig(models.Model):
         default=lambda self: self._get_default_country()
     )
     phone = fields.Char('Phone')
+    pos_stock_map = fields.Boolean(
+        'Compact Stock Map',
+        help="Stok produk tidak dihitung per produk saat POS dibuka. POS mengambil peta "
+             "product -> qty dari satu query quant di lokasi POS dan me-refresh berkala "
+             "hanya untuk produk yang berubah.")
+
+    def get_pos_stock_map(self, since=False):
+        """
+        Peta stok untuk POS: {product_id: qty} di lokasi sumber POS (termasuk child).
+        since (timestamp dari panggilan sebelumnya): hanya produk yang quant / move-nya
+        berubah sejak itu (dikurangi POS_STOCK_MAP_OVERLAP, jadi sebagian produk bisa terkirim
+        ulang). Return {'stamp': ..., 'quantities': {...}}.
+        """
+        self.ensure_one()
+        stamp = fields.Datetime.to_string(self.env.cr.now())
+        location = self.picking_type_id.default_src_location_id
+        if not location:
+            return {'stamp': stamp, 'quantities': {}}
+        product_ids = None
+        if since:
+            since = fields.Datetime.to_datetime(since) - POS_STOCK_MAP_OVERLAP
+            product_ids = self._pos_stock_changed_product_ids(location, since)
+            if not product_ids:
+                return {'stamp': stamp, 'quantities': {}}
+        return {'stamp': stamp, 'quantities': self._pos_stock_quantities(location, product_ids)}
+
+    def _pos_stock_changed_product_ids(self, location, since):
+        # quant yang berubah + move line done (quant yang sudah habis bisa terhapus)
+        Quant = self.env['stock.quant'].sudo()
+        MoveLine = self.env['stock.move.line'].sudo()
+        changed = Quant._read_group([
+            ('location_id', 'child_of', location.id),
+            ('write_date', '>', since),
+        ], ['product_id'])
+        moved = MoveLine._read_group([
+            ('state', '=', 'done'),
+            ('write_date', '>', since),
+            '|', ('location_id', 'child_of', location.id), ('location_dest_id', 'child_of', location.id),
+        ], ['product_id'])
+        return list({product.id for product, in changed + moved})
+
+    def _pos_stock_quantities(self, location, product_ids=None):
+        """
+        Satu _read_group quant per lokasi; stok pack = min(floor(qty komponen / qty_uom))
+        atas komponen storable, dihitung dalam satu pass.
+        """
+        Pack = self.env['product.pack'].sudo()
+        pack_domain = [('bi_product_template.is_pack', '=', True), ('product_id.is_storable', '=', True)]
+        if product_ids is not None:
+            # pack yang memuat komponen yang berubah ikut dihitung ulang
+            pack_domain.append(('bi_product_template.pack_ids.product_id', 'in', product_ids))
+        pack_rows = Pack.search_read(pack_domain, ['bi_product_template', 'product_id', 'qty_uom'])
+
+        quant_domain = [('location_id', 'child_of', location.id)]
+        if product_ids is not None:
+            component_ids = {row['product_id'][0] for row in pack_rows}
+            quant_domain.append(('product_id', 'in', list(set(product_ids) | component_ids)))
+        stock = {
+            product.id: quantity
+            for product, quantity in self.env['stock.quant'].sudo()._read_group(
+                quant_domain, ['product_id'], ['quantity:sum'])
+        }
+
+        quantities = dict.fromkeys(product_ids or [], 0.0)
+        quantities.update(stock)
+
+        pack_qty = {}
+        for row in pack_rows:
+            template_id = row['bi_product_template'][0]
+            qty_uom = row['qty_uom']
+            available = math.floor(stock.get(row['product_id'][0], 0.0) / qty_uom) if qty_uom else 0.0
+            pack_qty[template_id] = min(pack_qty.get(template_id, available), available)
+        if pack_qty:
+            variants = self.env['product.product'].sudo().search_read(
+                [('product_tmpl_id', 'in', list(pack_qty))], ['product_tmpl_id'])
+            for variant in variants:
+                quantities[variant['id']] = pack_qty[variant['product_tmpl_id'][0]]
+        return quantities
 
     def _get_default_country(self):
         """Set default country to Indonesia"""
@@ -252,17 +337,18 @@ class PosConfig(models.Model):
             raise UserError('Invalid coupon code')
         
         program = loyalty_card.program_id
+        # syarat program dari cache (di-invalidate saat program / rule berubah)
+        date_to, minimum_qty, minimum_amount = self.env['loyalty.program']._get_coupon_rule_conditions(program.id)
 
         today = fields.Date.context_today(self)
-        if program.date_to and program.date_to < today:
-            error_message = f"Coupon cannot be applied:\nPromo expired (End date: {program.date_to})"
+        if date_to and date_to < today:
+            error_message = f"Coupon cannot be applied:\nPromo expired (End date: {date_to})"
             raise UserError(error_message)
 
         points_display_value = 0
         if loyalty_card.points_display:
             try:
-                import re
-                numbers = re.findall(r'\d+', loyalty_card.points_display)
+                numbers = POINTS_DISPLAY_NUMBER.findall(loyalty_card.points_display)
                 if numbers:
                     points_display_value = float(numbers[0])
                 else:
@@ -274,22 +360,18 @@ class PosConfig(models.Model):
             error_message = "Coupon cannot be applied:\nPromo sudah pernah digunakan"
             raise UserError(error_message)
         
-        conditional_rules = program.rule_ids.filtered(lambda r: r.minimum_qty > 0 or r.minimum_amount > 0)
-        
-        if conditional_rules:
-            rule = conditional_rules[0]
-            
+        if minimum_qty or minimum_amount:
             total_qty, total_amount = self._get_current_order_totals()
             
             validation_errors = []
             
-            if rule.minimum_qty and total_qty < rule.minimum_qty:
-                validation_errors.append(f"Minimum {rule.minimum_qty} items required. Current: {int(total_qty)}")
+            if minimum_qty and total_qty < minimum_qty:
+                validation_errors.append(f"Minimum {minimum_qty} items required. Current: {int(total_qty)}")
 
-            if rule.minimum_amount and total_amount < rule.minimum_amount:
+            if minimum_amount and total_amount < minimum_amount:
                 currency = self.currency_id or self.env.company.currency_id
                 validation_errors.append(
-                    f"Minimum purchase {self.format_currency(rule.minimum_amount, currency)} required. Current: {self.format_currency(total_amount, currency)}"
+                    f"Minimum purchase {self.format_currency(minimum_amount, currency)} required. Current: {self.format_currency(total_amount, currency)}"
                 )
 
             if validation_errors:
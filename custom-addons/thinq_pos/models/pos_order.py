@@ -1,10 +1,18 @@
 from odoo import models, fields, api
-from odoo.exceptions import UserError
+from odoo.exceptions import AccessError, UserError
+from odoo.tools import SQL
+from odoo.tools.lru import LRU
+from odoo.tools.sql import create_index
 from datetime import datetime
 import logging
+import threading
 
 _logger = logging.getLogger(__name__)
 
+# pos_reference -> pos.order id per worker, key: (dbname, pos_reference)
+ORDER_REFERENCE_CACHE = LRU(4096)
+INVOICE_PDF_PREFIX = 'POS Invoice'
+
 PICKED_UP_STATES = [
     ('draft', 'Not Picked Up'),
     ('partially', 'Partially Picked Up'),
@@ -23,6 +31,82 @@ class PosOrder(models.Model):
 
     picked_up_state = fields.Selection(PICKED_UP_STATES, copy=False, compute='_compute_picked_up_state', store=True)
 
+    def init(self):
+        super().init()
+        # lookup by reference selalu "order by id desc limit 1"
+        create_index(self.env.cr, 'pos_order_pos_reference_id_idx', self._table, ['pos_reference', 'id DESC'])
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        # Order baru dengan reference yang sama jadi "order terakhir" untuk reference tsb
+        for vals in vals_list:
+            if vals.get('pos_reference'):
+                ORDER_REFERENCE_CACHE.pop((self.env.cr.dbname, vals['pos_reference']), None)
+        return super().create(vals_list)
+
+    def write(self, vals):
+        if 'pos_reference' in vals:
+            self._clear_reference_cache()
+            ORDER_REFERENCE_CACHE.pop((self.env.cr.dbname, vals['pos_reference']), None)
+        return super().write(vals)
+
+    def unlink(self):
+        self._clear_reference_cache()
+        return super().unlink()
+
+    def _clear_reference_cache(self):
+        for order in self:
+            ORDER_REFERENCE_CACHE.pop((self.env.cr.dbname, order.pos_reference), None)
+
+    @api.model
+    def _get_by_reference(self, order_ref):
+        """
+        Order (sudo) terakhir dengan pos_reference tsb. Id-nya di-cache per worker (tanpa
+        query); cache dibersihkan saat order dengan reference tsb dibuat, diubah
+        reference-nya atau dihapus di worker ini. Miss lewat index pos_order_pos_reference_id_idx.
+        """
+        if not order_ref:
+            return self.sudo().browse()
+        key = (self.env.cr.dbname, order_ref)
+        order_id = ORDER_REFERENCE_CACHE.get(key)
+        if order_id:
+            return self.sudo().browse(order_id)
+        order = self.sudo().search([
+                ('pos_reference', '=', order_ref)
+            ], limit=1, order='id desc')
+        if order:
+            ORDER_REFERENCE_CACHE[key] = order.id
+        return order
+
+    def _get_invoice_pdf_name(self):
+        """
+        Nama attachment PDF invoice POS (report thinq_pos.action_report_pos_invoice). Ikut
+        berubah kalau order, baris, resep, invoice atau payment-nya berubah, jadi PDF
+        tersimpan tidak pernah basi.
+        """
+        self.ensure_one()
+        write_dates = [self.write_date]
+        for records in (self.lines, self.refraction_line_ids, self.account_move, self.payment_ids):
+            write_dates += records.mapped('write_date')
+        stamp = max(filter(None, write_dates))
+        return '%s - %s - %s.pdf' % (INVOICE_PDF_PREFIX, self.id, stamp.strftime('%Y%m%d%H%M%S'))
+
+    def _unlink_outdated_invoice_pdfs(self):
+        """Hapus PDF invoice tersimpan yang namanya sudah tidak sesuai data order."""
+        attachments = self.env['ir.attachment'].search([
+            ('res_model', '=', self._name),
+            ('res_id', 'in', self.ids),
+            ('name', '=like', '%s - %%' % INVOICE_PDF_PREFIX),
+        ])
+        current_names = {order.id: order._get_invoice_pdf_name() for order in self}
+        outdated = attachments.filtered(lambda a: a.name != current_names.get(a.res_id))
+        if not outdated:
+            return
+        try:
+            outdated.unlink()
+        except AccessError:
+            _logger.info("Cannot remove outdated POS invoice PDFs %r for user %r", outdated.ids, self.env.uid)
+
     def _generate_pos_order_invoice(self):
         self = self.with_context(generate_pdf=False)
         res = super(PosOrder, self)._generate_pos_order_invoice()
@@ -43,23 +127,68 @@ class PosOrder(models.Model):
             return f"{formatted_amount} {currency.symbol}"
     
     def picked_up_all(self):
-        for line in self.lines.filtered(lambda x:not x.picked_up):
-            line.picked_up = True
-            line._onchange_picked_up()
+        # bisa untuk banyak order sekaligus: satu write untuk semua line
+        self.lines.action_picked_up()
 
     @api.depends('lines.picked_up')
     def _compute_picked_up_state(self):
         for rec in self:
-            state = 'draft'
-            product_lines = rec.lines.filtered(lambda x:x.product_id.type != 'service')
-            if all(l.picked_up for l in product_lines):
+            flags = [l.picked_up for l in rec.lines if l.product_id.type != 'service']
+            if all(flags):
                 state = 'done'
-            elif all(not l.picked_up for l in product_lines):
+            elif not any(flags):
                 state = 'draft'
-            elif any(not l.picked_up for l in product_lines):
+            else:
                 state = 'partially'
             rec.picked_up_state = state
 
+    @api.model
+    def repair_picked_up_state(self, batch_size=50000):
+        """
+        Backfill / perbaiki picked_up_state langsung di SQL, per batch id (commit per batch).
+        Aturan sama dengan _compute_picked_up_state: line non-service semua picked -> done
+        (termasuk order tanpa line non-service), tidak ada yang picked -> draft, sisanya partially.
+        """
+        self.env.flush_all()
+        last_id = 0
+        nb_updated = 0
+        while True:
+            self.env.cr.execute(SQL("""
+                WITH batch AS (
+                    SELECT id FROM pos_order WHERE id > %(last_id)s ORDER BY id LIMIT %(batch_size)s
+                ), states AS (
+                    SELECT batch.id,
+                           CASE
+                               WHEN bool_and(COALESCE(l.picked_up, false)) FILTER (WHERE pt.type != 'service') IS NOT FALSE THEN 'done'
+                               WHEN bool_or(COALESCE(l.picked_up, false)) FILTER (WHERE pt.type != 'service') THEN 'partially'
+                               ELSE 'draft'
+                           END AS state
+                      FROM batch
+                 LEFT JOIN pos_order_line l ON l.order_id = batch.id
+                 LEFT JOIN product_product pp ON pp.id = l.product_id
+                 LEFT JOIN product_template pt ON pt.id = pp.product_tmpl_id
+                  GROUP BY batch.id
+                ), updated AS (
+                    UPDATE pos_order o
+                       SET picked_up_state = states.state
+                      FROM states
+                     WHERE o.id = states.id
+                       AND o.picked_up_state IS DISTINCT FROM states.state
+                 RETURNING o.id
+                )
+                SELECT (SELECT max(id) FROM batch), (SELECT count(*) FROM updated)
+            """, last_id=last_id, batch_size=batch_size))
+            batch_last_id, batch_updated = self.env.cr.fetchone()
+            if not batch_last_id:
+                break
+            last_id = batch_last_id
+            nb_updated += batch_updated
+            if not getattr(threading.current_thread(), 'testing', False):
+                self.env.cr.commit()
+        self.invalidate_model(['picked_up_state'])
+        _logger.info("picked_up_state repaired on %s POS orders", nb_updated)
+        return nb_updated
+
     # >>>>>>>>>> Coupon Validation Functions >>>>>>>>>>
 
     # Tujuan: Override proses aplikasi coupon pada order POS.
@@ -88,78 +217,101 @@ class PosOrder(models.Model):
         return super()._apply_coupon_code(coupon_code)
 
 
+    # Tujuan: Validasi semua coupon dari batch order yang di-sync (offline sync) dalam satu pass
+    @api.model
+    def sync_from_ui(self, orders):
+        checks = []
+        for ui_order in orders:
+            checks += self._coupon_checks(ui_order)
+        for validation in self._validate_coupons_batch(checks):
+            if not validation['valid']:
+                raise UserError(validation['message'])
+        # _order_fields tidak perlu validasi ulang per order
+        return super(PosOrder, self.with_context(thinq_coupons_validated=True)).sync_from_ui(orders)
+
+    @api.model
+    def _coupon_checks(self, ui_order):
+        """[(coupon_code, total_qty, total_amount)] untuk coupon yang di-applied pada ui_order"""
+        codes = [lp['code'] for lp in ui_order.get('loyalty_points', []) or [] if lp.get('code')]
+        if not codes:
+            return []
+        # Get order totals from UI order
+        total_qty = sum(line[2]['qty'] for line in ui_order['lines'] if len(line) >= 3)
+        total_amount = ui_order.get('amount_total', 0)
+        return [(code, total_qty, total_amount) for code in codes]
+
     # Tujuan: Override proses pembuatan order dari data frontend (UI), termasuk validasi coupon
     @api.model  
     def _order_fields(self, ui_order):
         """Override to validate coupon saat order di-process"""
         # - Memanggil method asli Odoo untuk mendapatkan hasil awal
         result = super()._order_fields(ui_order)
-        
-        # Cek jika ada coupon yang applied
-        if ui_order.get('loyalty_points', []):
-            # - Mengecek apakah ada coupon yang di-applied pada order (ui_order['loyalty_points'])
-            for loyalty_point in ui_order['loyalty_points']:
-                if loyalty_point.get('code'):
-                    # - Untuk setiap coupon, ambil kode coupon dan hitung total_qty serta total_amount dari data order
-                    coupon_code = loyalty_point['code']
-                    
-                    # Get order totals from UI order
-                    total_qty = sum(line[2]['qty'] for line in ui_order['lines'] if len(line) >= 3)
-                    total_amount = ui_order.get('amount_total', 0)
-                    
-                    # - Memanggil _validate_coupon_with_totals untuk validasi coupon dengan data qty dan amount
-                    validation = self._validate_coupon_with_totals(coupon_code, total_qty, total_amount)
-                    
-                    # - Jika validasi gagal, raise UserError dengan pesan error
-                    if not validation['valid']:
-                        raise UserError(validation['message'])
-                    
+
+        # - Sudah divalidasi sekaligus di sync_from_ui
+        if self.env.context.get('thinq_coupons_validated'):
+            return result
+
+        # - Validasi semua coupon yang di-applied pada order (ui_order['loyalty_points']) sekaligus
+        for validation in self._validate_coupons_batch(self._coupon_checks(ui_order)):
+            # - Jika validasi gagal, raise UserError dengan pesan error
+            if not validation['valid']:
+                raise UserError(validation['message'])
+
         # - Jika lolos, lanjutkan proses order
         return result
-    
+
     # Tujuan: Validasi coupon berdasarkan total qty dan amount yang sudah diketahui.
     def _validate_coupon_with_totals(self, coupon_code, total_qty, total_amount):
         """Validate coupon dengan total yang sudah diketahui"""
-        loyalty_program = self.env['loyalty.program']
-        
+        return self._validate_coupons_batch([(coupon_code, total_qty, total_amount)])[0]
+
+    @api.model
+    def _validate_coupons_batch(self, checks):
+        """
+        checks: [(coupon_code, total_qty, total_amount)] -> [{'valid', 'message'}] dengan urutan sama.
+        Satu query untuk semua card, syarat rule dari cache per program (loyalty.program._get_coupon_rule_conditions).
+        """
+        if not checks:
+            return []
         # - Cari coupon dan program berdasarkan kode coupon
-        coupon = self.env['loyalty.card'].search([('code', '=', coupon_code)], limit=1)
-        # - Jika tidak ditemukan, return validasi gagal
-        if not coupon:
-            return {'valid': False, 'message': 'Invalid coupon code'}
-        
-        program = coupon.program_id
-        if not program:
-            return {'valid': False, 'message': 'Invalid coupon program'}
+        cards = self.env['loyalty.card'].search_read(
+            [('code', 'in', list({code for code, _qty, _amount in checks}))], ['code', 'program_id'])
+        program_by_code = {}
+        for card in cards:
+            program_by_code.setdefault(card['code'], card['program_id'] and card['program_id'][0])
 
-        # Get rules with conditions -> minimum_qty and minimum_amount
-        conditional_rules = program.rule_ids.filtered(lambda r: r.minimum_qty > 0 or r.minimum_amount > 0)
-        
-        # - Jika tidak ada rules, coupon dianggap valid
-        if not conditional_rules:
-            return {'valid': True, 'message': ''}
-        
-        # - Jika ada, cek apakah total_qty dan total_amount memenuhi syarat
-        rule = conditional_rules[0]
-        validation_errors = []
-
-        # - Jika tidak memenuhi, return validasi gagal beserta pesan error
-        # Check minimum quantity
-        if rule.minimum_qty and total_qty < rule.minimum_qty:
-            validation_errors.append(f"Minimum {rule.minimum_qty} items required. Current: {int(total_qty)}")
-
-        # Check minimum amount
-        if rule.minimum_amount and total_amount < rule.minimum_amount:
-            validation_errors.append(f"Minimum purchase ${rule.minimum_amount:.2f} required. Current: ${total_amount:.2f}")
-
-        if validation_errors:
-            return {
-                'valid': False,
-                'message': 'Coupon cannot be applied:\n' + '\n'.join(validation_errors)
-            }
-
-         # - Jika memenuhi, return validasi sukses
-        return {'valid': True, 'message': ''}
+        loyalty_program = self.env['loyalty.program']
+        results = []
+        for coupon_code, total_qty, total_amount in checks:
+            # - Jika tidak ditemukan, validasi gagal
+            if coupon_code not in program_by_code:
+                results.append({'valid': False, 'message': 'Invalid coupon code'})
+                continue
+            program_id = program_by_code[coupon_code]
+            if not program_id:
+                results.append({'valid': False, 'message': 'Invalid coupon program'})
+                continue
+
+            _date_to, minimum_qty, minimum_amount = loyalty_program._get_coupon_rule_conditions(program_id)
+            validation_errors = []
+
+            # - Jika tidak ada rules bersyarat (minimum 0), coupon dianggap valid
+            # Check minimum quantity
+            if minimum_qty and total_qty < minimum_qty:
+                validation_errors.append(f"Minimum {minimum_qty} items required. Current: {int(total_qty)}")
+
+            # Check minimum amount
+            if minimum_amount and total_amount < minimum_amount:
+                validation_errors.append(f"Minimum purchase ${minimum_amount:.2f} required. Current: ${total_amount:.2f}")
+
+            if validation_errors:
+                results.append({
+                    'valid': False,
+                    'message': 'Coupon cannot be applied:\n' + '\n'.join(validation_errors)
+                })
+            else:
+                results.append({'valid': True, 'message': ''})
+        return results
     
     # Catatan:
     # Fungsi-fungsi di pos_order.py yang berhubungan dengan coupon (seperti _apply_coupon_code, _order_fields, dan _validate_coupon_with_totals)
@@ -169,9 +321,7 @@ class PosOrder(models.Model):
 
     @api.model
     def action_invoice_download_pdf(self, order_ref):
-        order_id = self.sudo().search([
-                ('pos_reference', '=', order_ref)
-            ], limit=1, order='id desc')
+        order_id = self._get_by_reference(order_ref)
         return {
             'type': 'ir.actions.act_url',
             'url': '/thinq_pos/report/pos_order/invoice/%s' % order_id.id,
@@ -196,6 +346,13 @@ class PosOrderLine(models.Model):
             vals.update({'picked_lock': True})
         res = super(PosOrderLine, self).write(vals)
         return res
+
+    def action_picked_up(self):
+        """Pickup banyak line (lintas order) dalam satu write, picked_up_state dihitung sekali per order."""
+        lines = self.filtered(lambda x: not x.picked_up)
+        if lines:
+            lines.write({'picked_up': True, 'picked_date': fields.Datetime.now()})
+        return True
     
     @api.onchange('picked_up')
     def _onchange_picked_up(self):
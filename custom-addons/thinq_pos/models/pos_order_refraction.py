@@ -59,41 +59,73 @@ class PosOrderRefraction(models.Model):
                 record.p_vitrum_cylndr = record.product_id.vitrum_cylndr
                 record.p_add = record.product_id.add
 
+    @api.model
+    def _get_order_by_reference(self, order_ref):
+        return self.env['pos.order']._get_by_reference(order_ref)
+
     @api.model
     def create_refractions(self, order_ref, product_ids):
-        order_id = self.env['pos.order'].sudo().search([
-                ('pos_reference', '=', order_ref)
-            ], limit=1, order='id desc')
+        return self.upsert_refractions(order_ref, product_ids)
 
-        ids = []
-        order_id.refraction_line_ids = [(6,0,[])]
-        for _product in product_ids:
-            self._create_refraction(ids, _product, order_id, f"{_product.get('product_id', 0)}-{_product.get('line_index', 0)}")
-        return ids
+    @api.model
+    def upsert_refractions(self, order_ref, product_lines):
+        """
+        Satu RPC untuk semua lensa di order: order dicari sekali, refraction di-upsert
+        berdasarkan product_key (create sekaligus untuk yang belum ada, yang sudah tidak
+        ada di order dihapus, yang masih ada dipertahankan beserta isian kasir).
+        product_lines: [{'product_id': .., 'line_index': ..}]
+        """
+        order_id = self._get_order_by_reference(order_ref)
+        if not order_id:
+            return []
+
+        wanted = {}
+        for _product in product_lines:
+            wanted[f"{_product.get('product_id', 0)}-{_product.get('line_index', 0)}"] = _product.get('product_id', 0)
+
+        existing = self.search([('pos_order_id', '=', order_id.id)])
+        by_key = {}
+        for refraction_id in existing:
+            if refraction_id.product_key in wanted:
+                by_key.setdefault(refraction_id.product_key, refraction_id)
+        (existing - self.browse([r.id for r in by_key.values()])).sudo().unlink()
+
+        # prefetch semua produk lensa sekaligus
+        products = self.env['product.product'].browse(set(wanted.values()))
+        product_map = {p.id: p for p in products}
+        missing = [key for key in wanted if key not in by_key]
+        created = self.create([
+            self._prepare_refraction_vals(order_id, key, product_map[wanted[key]])
+            for key in missing
+        ])
+        by_key.update(zip(missing, created))
+
+        return [
+            {'id': by_key[key].id, 'data': self._refraction_payload(by_key[key])}
+            for key in wanted
+        ]
+
+    @api.model
+    def _prepare_refraction_vals(self, order_id, product_key, product_id):
+        return {
+            'product_key': product_key,
+            'product_id': product_id.id,
+            'name': product_id.name,
+            'pos_order_id': order_id.id,
+            'vitrum_spher': 0.0 if product_id.is_plano else product_id.vitrum_spher,
+            'vitrum_cylndr': 0.0 if product_id.is_plano else product_id.vitrum_cylndr,
+            'axis': 0.0,
+            'prima_basis': 0.0,
+            'add': 0.0 if product_id.is_plano else product_id.add,
+            'pd': 0.0,
+        }
 
-    def _create_refraction(self, ids, _product, order_id, product_key):
-        refraction_id = self.search([('product_key','=',product_key),('pos_order_id','=',order_id.id)],limit=1)
-        if not refraction_id:
-            product_id = self.env['product.product'].browse(_product.get('product_id', 0))
-            data = {
-                'product_key': product_key,
-                'product_id': product_id.id,
-                'name': product_id.name,
-                'pos_order_id': order_id.id,
-                'vitrum_spher': 0.0 if product_id.is_plano else product_id.vitrum_spher,
-                'vitrum_cylndr': 0.0 if product_id.is_plano else product_id.vitrum_cylndr,
-                'axis': 0.0,
-                'prima_basis': 0.0,
-                'add': 0.0 if product_id.is_plano else product_id.add,
-                'pd': 0.0,
-            }
-            refraction_id = self.create(data)
-        
-        refract_data = {
+    def _refraction_payload(self, refraction_id):
+        return {
             'product_key':refraction_id.product_key,
             'product_id':refraction_id.product_id.id,
             'name':refraction_id.product_id.name,
-            'pos_order_id':order_id.id,
+            'pos_order_id':refraction_id.pos_order_id.id,
             'vitrum_spher':refraction_id.vitrum_spher,
             'vitrum_cylndr':refraction_id.vitrum_cylndr,
             'axis':refraction_id.axis,
@@ -101,17 +133,10 @@ class PosOrderRefraction(models.Model):
             'add':refraction_id.add,
             'pd':refraction_id.pd,
         }
-        
-        ids.append({
-            'id': refraction_id.id,
-            'data': refract_data
-        })
 
     @api.model
     def show_refractions(self, order_ref):
-        order_id = self.env['pos.order'].sudo().search([
-                ('pos_reference', '=', order_ref)
-            ], limit=1, order='id desc')
+        order_id = self._get_order_by_reference(order_ref)
 
         ids = []
 
@@ -145,9 +170,7 @@ class PosOrderRefraction(models.Model):
     def available_refractions(self, order_ref):
         ids = []
 
-        order_id = self.env['pos.order'].sudo().search([
-                ('pos_reference', '=', order_ref)
-            ], limit=1, order='id desc')
+        order_id = self._get_order_by_reference(order_ref)
 
         if order_id:
             refraction_ids = self.sudo().search([
@@ -163,9 +186,7 @@ class PosOrderRefraction(models.Model):
     def clean_refractions_data(self, order_ref):
         ids = []
 
-        order_id = self.env['pos.order'].sudo().search([
-                ('pos_reference', '=', order_ref)
-            ], limit=1, order='id desc')
+        order_id = self._get_order_by_reference(order_ref)
 
         if order_id:
             refraction_ids = self.sudo().search([
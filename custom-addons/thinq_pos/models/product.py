@@ -7,5 +7,21 @@ class ProductProductInherit(models.Model):
     @api.model
     def _load_pos_data_fields(self, config_id):
         fields = super()._load_pos_data_fields(config_id)
-        fields += ['is_lens', 'is_frame', 'qty_available']
+        fields += ['is_lens', 'is_frame']
+        if self.env['pos.config'].browse(config_id).pos_stock_map:
+            # Stok dikirim terpisah lewat pos.config.get_pos_stock_map, bukan compute qty_available per produk
+            fields += ['is_storable']
+        else:
+            fields += ['qty_available']
+        return fields
+
+
+class ProductPackInherit(models.Model):
+    _inherit = 'product.pack'
+
+    @api.model
+    def _load_pos_data_fields(self, config_id):
+        fields = super()._load_pos_data_fields(config_id)
+        if self.env['pos.config'].browse(config_id).pos_stock_map:
+            fields = [f for f in fields if f != 'qty_available']
         return fields
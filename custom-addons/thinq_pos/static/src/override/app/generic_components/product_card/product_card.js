@@ -27,8 +27,12 @@ patch(ProductCard.prototype, {
             this.props.onClick = async (ev) => {
                 const product = this.props.product;
                 if (product.is_storable) {
-                    const availableQty = this.props.availableQty
-                    if (availableQty <= 0) {
+                    const availableQty = this.pos.config.pos_stock_map
+                        ? this.getAvailableQuantity
+                        : this.props.availableQty
+                    // Qty kosong / belum diketahui tidak dianggap habis ("" <= 0 bernilai true)
+                    const isKnownQty = availableQty !== undefined && availableQty !== null && availableQty !== "";
+                    if (isKnownQty && availableQty <= 0) {
                         this.dialog.add(
                             ConfirmationDialog,
                             {
@@ -46,7 +50,9 @@ patch(ProductCard.prototype, {
         };
 
         onMounted(async () => {
-            await this._loadAvailableQty();
+            if (!this.pos.config.pos_stock_map) {
+                await this._loadAvailableQty();
+            }
         })
     },
 
@@ -85,6 +91,9 @@ patch(ProductCard.prototype, {
     },
 
     get getAvailableQuantity() {
+        if (this.pos.config.pos_stock_map) {
+            return this.pos.getStockMapQty(this.props.product);
+        }
         return this.state.availableQty ?? "";
     },
 });
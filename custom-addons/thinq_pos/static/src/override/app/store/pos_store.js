@@ -15,6 +15,54 @@ patch(PosStore.prototype, {
         this.bus.trigger('DISPLAY-PROMOTIONS');
     },
 
+    // @override
+    async afterProcessServerData() {
+        await super.afterProcessServerData(...arguments);
+        this.stockMap = {};
+        this.stockMapStamp = false;
+        this.stopStockMapRefresh();
+        if (this.config.pos_stock_map) {
+            await this.refreshStockMap();
+            // refresh incremental: hanya produk yang berubah sejak stamp terakhir
+            this.stockMapInterval = setInterval(() => this.refreshStockMap(), 60000);
+        }
+    },
+
+    stopStockMapRefresh() {
+        if (this.stockMapInterval) {
+            clearInterval(this.stockMapInterval);
+            this.stockMapInterval = null;
+        }
+    },
+
+    // @override
+    async closePos() {
+        this.stopStockMapRefresh();
+        return await super.closePos(...arguments);
+    },
+
+    async refreshStockMap() {
+        const result = await this.data.call(
+            "pos.config",
+            "get_pos_stock_map",
+            [this.config.id, this.stockMapStamp]
+        );
+        Object.assign(this.stockMap, result.quantities);
+        this.stockMapStamp = result.stamp;
+    },
+
+    getStockMapQty(product) {
+        const qty = this.stockMap[product.id];
+        if (product.is_pack) {
+            // Pack tanpa entry di stock map: qty belum diketahui (undefined), bukan habis
+            return qty;
+        }
+        if (!product.is_storable) {
+            return "";
+        }
+        return qty ?? 0;
+    },
+
     async doPrintInvoice(order_ref) {
         const downloadAction = await this.data.call(
             "pos.order",
@@ -203,7 +251,7 @@ patch(PosStore.prototype, {
 
         let resp = await this.data.call(
             'pos.order.refraction',
-            "create_refractions",
+            "upsert_refractions",
             [this.get_order().pos_reference, products]);
 
         if (resp) {